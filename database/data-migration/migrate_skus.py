@@ -0,0 +1,367 @@
+# Set-based SKU migration for catalog refreshes.
+#
+# Applies an old -> new SKU mapping file to `products`, `bill_of_materials` and `sku_migration_log`
+# without hand-written SQL. The mapping is loaded with COPY into a session temp table, validated,
+# then applied in bounded batches, each in its own short transaction with a lock timeout, so the
+# weekly Glue job, the micro-batch Lambda and the reports keep running during a migration.
+#
+# Mapping file (CSV with header; only old_sku and new_sku are required):
+#
+#     old_sku,new_sku,product_id,product_name,product_color,reason
+#
+# - product_id/product_name/product_color create the new product when new_sku isn't in `products`
+# - the old product keeps its SKU (order history still references it) and is renamed with the
+#   legacy suffix, like the original "- V1" migration
+# - bill of materials rows move to the new SKU unless the new SKU already has its own
+# - every batch is idempotent, so a failed or interrupted run is resumed by running it again
+#
+# Usage:
+#     python migrate_skus.py mapping.csv [--batch-size 50] [--lock-timeout-ms 2000] [--dry-run]
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+# Shared modules (salka_secrets, salka_reports) live in /shared
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "shared",
+    ),
+)
+
+import salka_reports
+
+MAPPING_COLUMNS = [
+    "old_sku",
+    "new_sku",
+    "product_id",
+    "product_name",
+    "product_color",
+    "reason",
+]
+REQUIRED_COLUMNS = ["old_sku", "new_sku"]
+
+# SQLSTATE 55P03: lock_timeout expired waiting for a row/table lock
+LOCK_NOT_AVAILABLE = "55P03"
+
+CREATE_MAPPING_SQL = """
+CREATE TEMP TABLE sku_mapping (
+    mapping_row SERIAL PRIMARY KEY,
+    old_sku VARCHAR(50),
+    new_sku VARCHAR(50),
+    product_id VARCHAR(50),
+    product_name VARCHAR(255),
+    product_color VARCHAR(255),
+    reason VARCHAR(255)
+)
+"""
+
+# Each check returns offending SKUs; any result stops the migration before anything is changed
+VALIDATION_CHECKS = [
+    (
+        "Rows missing old_sku or new_sku",
+        """
+        SELECT mapping_row::TEXT FROM sku_mapping
+        WHERE COALESCE(old_sku, '') = '' OR COALESCE(new_sku, '') = ''
+        """,
+    ),
+    (
+        "old_sku mapped more than once",
+        """
+        SELECT old_sku FROM sku_mapping GROUP BY old_sku HAVING COUNT(*) > 1
+        """,
+    ),
+    (
+        "new_sku mapped from more than one old_sku with a bill of materials",
+        """
+        SELECT m.new_sku FROM sku_mapping m
+        WHERE m.old_sku <> m.new_sku
+            AND EXISTS (SELECT 1 FROM bill_of_materials bom WHERE bom.product_sku = m.old_sku)
+        GROUP BY m.new_sku HAVING COUNT(*) > 1
+        """,
+    ),
+    (
+        "Chained mappings (new_sku is also migrated away)",
+        """
+        SELECT m.new_sku FROM sku_mapping m
+        JOIN sku_mapping chained ON chained.old_sku = m.new_sku AND chained.new_sku <> chained.old_sku
+        WHERE m.old_sku <> m.new_sku
+        """,
+    ),
+    (
+        "new_sku not in products and no product_id/product_name to create it",
+        """
+        SELECT m.new_sku FROM sku_mapping m
+        WHERE NOT EXISTS (SELECT 1 FROM products p WHERE p.product_sku = m.new_sku)
+            AND (COALESCE(m.product_id, '') = '' OR COALESCE(m.product_name, '') = '')
+        """,
+    ),
+]
+
+# Applied per batch of mapping rows (:first_row..:last_row), each statement idempotent
+BATCH_STEPS = [
+    (
+        "products_added",
+        """
+        INSERT INTO products (product_id, product_sku, product_name, product_color)
+        SELECT m.product_id, m.new_sku, m.product_name, COALESCE(NULLIF(m.product_color, ''), 'Default Color')
+        FROM sku_mapping m
+        WHERE m.mapping_row BETWEEN :first_row AND :last_row
+            AND COALESCE(m.product_name, '') <> ''
+            -- Rows for existing SKUs may leave product_id empty (NULL): skip them before the
+            -- NOT NULL check, which runs ahead of ON CONFLICT
+            AND NOT EXISTS (SELECT 1 FROM products p WHERE p.product_sku = m.new_sku)
+        ON CONFLICT (product_sku) DO NOTHING
+        """,
+    ),
+    (
+        "products_marked_legacy",
+        """
+        UPDATE products p
+        SET product_name = p.product_name || CAST(:legacy_suffix AS TEXT), modified_at = CURRENT_TIMESTAMP
+        FROM sku_mapping m
+        WHERE m.mapping_row BETWEEN :first_row AND :last_row
+            AND p.product_sku = m.old_sku
+            AND m.old_sku <> m.new_sku
+            AND right(p.product_name, length(CAST(:legacy_suffix AS TEXT))) <> :legacy_suffix
+        """,
+    ),
+    (
+        "bom_rows_moved",
+        """
+        UPDATE bill_of_materials bom
+        SET product_sku = m.new_sku, modified_at = CURRENT_TIMESTAMP
+        FROM sku_mapping m
+        WHERE m.mapping_row BETWEEN :first_row AND :last_row
+            AND bom.product_sku = m.old_sku
+            AND m.old_sku <> m.new_sku
+            AND NOT EXISTS (
+                SELECT 1 FROM bill_of_materials existing WHERE existing.product_sku = m.new_sku
+            )
+        """,
+    ),
+    (
+        "skus_logged",
+        """
+        INSERT INTO sku_migration_log (old_sku, new_sku, migration_reason)
+        SELECT m.old_sku, m.new_sku, COALESCE(NULLIF(m.reason, ''), :default_reason)
+        FROM sku_mapping m
+        WHERE m.mapping_row BETWEEN :first_row AND :last_row
+            AND NOT EXISTS (
+                SELECT 1 FROM sku_migration_log l
+                WHERE l.old_sku = m.old_sku AND l.new_sku = m.new_sku
+            )
+        """,
+    ),
+]
+
+
+def get_connection():
+    import pg8000.native
+    import salka_secrets
+
+    def connect(secret):
+        return pg8000.native.Connection(
+            user=secret["username"],
+            password=secret["password"],
+            host=secret["host"],
+            port=int(secret["port"]),
+            database=secret["dbName"],
+            application_name="salka-sku-migration",
+        )
+
+    return salka_secrets.call_with_secret_refresh(
+        salka_secrets.get_rds_secret_name(), connect
+    )
+
+
+def load_mapping(conn, mapping_path):
+    # COPY the mapping file into a session temp table (kept across the batch transactions)
+    with open(mapping_path, newline="", encoding="utf-8") as mapping_file:
+        header = [column.strip() for column in next(csv.reader(mapping_file))]
+
+    unknown = [column for column in header if column not in MAPPING_COLUMNS]
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if unknown or missing:
+        raise ValueError(
+            f"Mapping header must use {MAPPING_COLUMNS} (unknown: {unknown}, missing: {missing})"
+        )
+
+    conn.run(CREATE_MAPPING_SQL)
+    with open(mapping_path, "rb") as mapping_file:
+        conn.run(
+            f"COPY sku_mapping ({', '.join(header)}) FROM STDIN WITH (FORMAT csv, HEADER true)",
+            stream=mapping_file,
+        )
+    conn.run(
+        "UPDATE sku_mapping SET old_sku = trim(old_sku), new_sku = trim(new_sku)"
+    )
+    conn.run("ANALYZE sku_mapping")
+
+    return conn.run("SELECT COUNT(*) FROM sku_mapping")[0][0]
+
+
+def validate_mapping(conn):
+    problems = []
+    for description, sql in VALIDATION_CHECKS:
+        offending = sorted({row[0] for row in conn.run(sql)})
+        if offending:
+            problems.append(f"{description}: {', '.join(offending[:20])}")
+    return problems
+
+
+def summarize_mapping(conn):
+    # What the migration will touch, for dry runs and the start-of-run report
+    return dict(
+        zip(
+            ["skus_changed", "products_to_add", "legacy_products", "bom_rows"],
+            conn.run(
+                """
+                SELECT
+                    COUNT(*) FILTER (WHERE m.old_sku <> m.new_sku),
+                    COUNT(*) FILTER (
+                        WHERE NOT EXISTS (SELECT 1 FROM products p WHERE p.product_sku = m.new_sku)
+                    ),
+                    COUNT(*) FILTER (
+                        WHERE m.old_sku <> m.new_sku
+                            AND EXISTS (SELECT 1 FROM products p WHERE p.product_sku = m.old_sku)
+                    ),
+                    (
+                        SELECT COUNT(*) FROM bill_of_materials bom
+                        JOIN sku_mapping bm ON bm.old_sku = bom.product_sku
+                        WHERE bm.old_sku <> bm.new_sku
+                    )
+                FROM sku_mapping m
+                """
+            )[0],
+        )
+    )
+
+
+def apply_batch(conn, first_row, last_row, options):
+    # One short transaction: give up on a lock quickly instead of queueing behind the ETL
+    conn.run("BEGIN")
+    try:
+        conn.run(f"SET LOCAL lock_timeout = {int(options.lock_timeout_ms)}")
+        counts = {}
+        for name, sql in BATCH_STEPS:
+            conn.run(
+                sql,
+                first_row=first_row,
+                last_row=last_row,
+                legacy_suffix=options.legacy_suffix,
+                default_reason=options.reason,
+            )
+            counts[name] = conn.row_count
+
+        # Catalog changes affect the cut list: invalidate cached reports (last, so the lock is brief)
+        if any(counts.values()):
+            conn.run(salka_reports.BUMP_DATA_VERSION_SQL)
+        conn.run("COMMIT")
+        return counts
+
+    except Exception:
+        conn.run("ROLLBACK")
+        raise
+
+
+def apply_with_retry(conn, first_row, last_row, options):
+    for attempt in range(1, options.max_retries + 1):
+        try:
+            return apply_batch(conn, first_row, last_row, options)
+        except Exception as e:
+            if LOCK_NOT_AVAILABLE not in str(e) or attempt == options.max_retries:
+                raise
+            wait_seconds = options.pause_seconds * 2**attempt
+            print(
+                f"  Lock timeout on rows {first_row}-{last_row}, retrying in {wait_seconds:.1f}s "
+                f"(attempt {attempt}/{options.max_retries})"
+            )
+            time.sleep(wait_seconds)
+
+
+def migrate(options):
+    conn = get_connection()
+    try:
+        total = load_mapping(conn, options.mapping_file)
+        print(f"Loaded {total} SKU mappings from {options.mapping_file}")
+
+        problems = validate_mapping(conn)
+        if problems:
+            for problem in problems:
+                print(f"  Invalid mapping - {problem}")
+            raise SystemExit("Mapping file failed validation; nothing was changed")
+
+        summary = summarize_mapping(conn)
+        print(
+            f"Plan: {summary['skus_changed']} SKUs change, {summary['products_to_add']} products to add, "
+            f"{summary['legacy_products']} products to mark legacy, {summary['bom_rows']} BOM rows to move"
+        )
+        if options.dry_run:
+            print("Dry run - no changes made")
+            return summary
+
+        mapping_rows = [row[0] for row in conn.run("SELECT mapping_row FROM sku_mapping ORDER BY 1")]
+        batches = [
+            mapping_rows[start : start + options.batch_size]
+            for start in range(0, len(mapping_rows), options.batch_size)
+        ]
+
+        totals = {name: 0 for name, _ in BATCH_STEPS}
+        started = time.monotonic()
+        for number, batch in enumerate(batches, start=1):
+            counts = apply_with_retry(conn, batch[0], batch[-1], options)
+            for name, count in counts.items():
+                totals[name] += count
+
+            done = sum(len(b) for b in batches[:number])
+            elapsed = time.monotonic() - started
+            remaining = elapsed / done * (total - done)
+            print(
+                f"Batch {number}/{len(batches)}: {done}/{total} mappings | "
+                + ", ".join(f"{name} {count}" for name, count in counts.items())
+                + f" | {elapsed:.1f}s elapsed, ~{remaining:.0f}s left"
+            )
+
+            # Let queued ETL and report queries through between batches
+            if number < len(batches):
+                time.sleep(options.pause_seconds)
+
+        print(
+            "Migration complete: " + ", ".join(f"{name} {count}" for name, count in totals.items())
+        )
+        return totals
+
+    finally:
+        conn.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Apply an old -> new SKU mapping file")
+    parser.add_argument("mapping_file", help="CSV with old_sku,new_sku[,product_id,...] header")
+    parser.add_argument("--batch-size", type=int, default=50, help="Mappings per transaction")
+    parser.add_argument(
+        "--lock-timeout-ms", type=int, default=2000, help="Per-batch lock_timeout"
+    )
+    parser.add_argument(
+        "--max-retries", type=int, default=5, help="Attempts per batch on lock timeout"
+    )
+    parser.add_argument(
+        "--pause-seconds", type=float, default=0.2, help="Pause between batches"
+    )
+    parser.add_argument("--legacy-suffix", default=" - V1", help="Appended to old product names")
+    parser.add_argument(
+        "--reason", default="Catalog migration", help="Log reason for rows without one"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Load and validate only, change nothing"
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    migrate(parse_args())
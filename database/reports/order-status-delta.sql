@@ -0,0 +1,25 @@
+-- Status changes logged since the previous report run (newly pending, newly fulfilled, refunded)
+SELECT 
+    l.change_type, 
+    l.logged_at, 
+    o.order_number, 
+    o.customer_name, 
+    l.previous_status, 
+    l.new_status, 
+    l.new_fulfilled_on AS fulfilled_on, 
+    l.new_refund_total - COALESCE(l.previous_refund_total, 0) AS refund_amount, 
+    oi.product_sku, 
+    oi.product_name, 
+    oi.product_color, 
+    oi.product_quantity
+FROM order_status_log l
+
+JOIN orders o ON l.order_id = o.order_id
+LEFT JOIN order_items oi ON o.order_id = oi.order_id
+
+-- Window by loader transaction id, not time: a load still in flight when the previous report ran
+-- committed rows with an earlier logged_at, but its transaction id is at or above that run's xmin
+WHERE l.logged_xid >= (SELECT COALESCE(MAX(covered_xid), 0) FROM report_runs)
+    AND l.logged_xid < pg_snapshot_xmin(pg_current_snapshot())::TEXT::BIGINT
+
+ORDER BY l.change_type, l.logged_at, o.order_number;
@@ -0,0 +1,23 @@
+-- Monthly sales by shipping region and product for the last 12 months
+-- Reads the precomputed sales_rollup table instead of aggregating orders and order_items
+SELECT 
+    r.period_start AS month, 
+    r.shipping_country, 
+    r.shipping_state, 
+    r.product_sku, 
+    p.product_name, 
+    p.product_color, 
+    r.units, 
+    r.order_count, 
+    r.revenue, 
+    r.discount_total, 
+    r.refund_total, 
+    r.revenue - r.discount_total - r.refund_total AS net_revenue
+FROM sales_rollup r
+
+LEFT JOIN products p ON r.product_sku = p.product_sku
+
+WHERE r.period_grain = 'month'
+    AND r.period_start >= date_trunc('month', now() - INTERVAL '11 months')::DATE
+
+ORDER BY month DESC, r.shipping_country, r.shipping_state, net_revenue DESC;
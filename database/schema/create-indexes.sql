@@ -11,4 +11,11 @@ CREATE INDEX idx_order_items_product_sku ON order_items(product_sku);
 CREATE INDEX idx_products_product_sku ON products(product_sku);
 
 -- bill_of_materials index
-CREATE INDEX idx_bill_of_materials_product_sku ON bill_of_materials(product_sku);
\ No newline at end of file
+CREATE INDEX idx_bill_of_materials_product_sku ON bill_of_materials(product_sku);
+
+-- order_status_log indexes
+CREATE INDEX idx_order_status_log_logged_xid ON order_status_log(logged_xid);  -- For delta report window
+CREATE INDEX idx_order_status_log_order_id ON order_status_log(order_id);
+
+-- sales_rollup index (the primary key covers period lookups)
+CREATE INDEX idx_sales_rollup_product_sku ON sales_rollup(product_sku, period_grain, period_start);  -- For SKU trends and cell refresh
\ No newline at end of file
@@ -67,4 +67,113 @@ CREATE TABLE bill_of_materials (
     -- Timestamps
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     modified_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+);
+
+-- Append-only log of order status transitions captured by upsert_orders_from_staging()
+-- No foreign key to orders: log rows are written before the upsert inserts new orders
+CREATE TABLE order_status_log (
+    log_id BIGSERIAL PRIMARY KEY,
+    order_id VARCHAR(50) NOT NULL,
+
+    -- Transition type: 'new_pending', 'fulfilled', 'refunded' or 'status_change'
+    change_type VARCHAR(20) NOT NULL,
+
+    -- Status and fulfillment before/after (previous values are NULL for new orders)
+    previous_status VARCHAR(20),
+    new_status VARCHAR(20) NOT NULL,
+    previous_fulfilled_on TIMESTAMP NULL,
+    new_fulfilled_on TIMESTAMP NULL,
+    previous_refund_total NUMERIC(10,2),
+    new_refund_total NUMERIC(10,2) NOT NULL DEFAULT 0.00,
+
+    logged_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+
+    -- Id of the loader transaction that wrote the row: the delta report's watermark
+    -- (logged_at is the loader's transaction start, so rows can commit "in the past")
+    logged_xid BIGINT NOT NULL DEFAULT pg_current_xact_id()::TEXT::BIGINT
+);
+
+-- Report runs: the delta report covers status changes logged since the previous run
+CREATE TABLE report_runs (
+    run_id SERIAL PRIMARY KEY,
+    report_mode VARCHAR(20) NOT NULL, -- 'full' or 'delta'
+    covered_until TIMESTAMP WITH TIME ZONE NOT NULL,
+    -- Snapshot xmin at report time: every transaction below it had finished, so log rows with
+    -- logged_xid < covered_xid were all visible; later rows are picked up by the next run
+    covered_xid BIGINT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Sales and demographic rollup, maintained incrementally by refresh_sales_rollup()
+-- One row per period × shipping country/state × product SKU; order-level discounts and refunds
+-- are allocated to line items by their share of the order's item revenue
+CREATE TABLE sales_rollup (
+    -- Cell key
+    period_grain VARCHAR(5) NOT NULL, -- 'day', 'week' (starting Monday) or 'month'
+    period_start DATE NOT NULL,
+    shipping_country VARCHAR(50) NOT NULL, -- 'Unknown' when the order has no shipping address
+    shipping_state VARCHAR(50) NOT NULL,
+    product_sku VARCHAR(50) NOT NULL,
+
+    -- Measures
+    revenue NUMERIC(12,2) NOT NULL DEFAULT 0.00, -- quantity × unit price paid
+    units INTEGER NOT NULL DEFAULT 0,
+    discount_total NUMERIC(12,2) NOT NULL DEFAULT 0.00,
+    refund_total NUMERIC(12,2) NOT NULL DEFAULT 0.00,
+    order_count INTEGER NOT NULL DEFAULT 0,
+
+    refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (period_grain, period_start, shipping_country, shipping_state, product_sku)
+);
+
+-- SKU transitions applied by data-migration/update-products.sql and data-migration/migrate_skus.py
+CREATE TABLE IF NOT EXISTS sku_migration_log (
+    migration_id SERIAL PRIMARY KEY,
+    old_sku VARCHAR(50),
+    new_sku VARCHAR(50),
+    migration_date TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    migration_reason VARCHAR(255) DEFAULT 'E-commerce migration'
+);
+
+-- Single-row counter bumped whenever the ETL commits order changes or a SKU migration changes the
+-- catalog; the report API clears its cache when it changes
+-- Loaders bump it as the last statement before COMMIT (salka_reports.BUMP_DATA_VERSION_SQL), so the
+-- row lock is held only while committing
+CREATE TABLE etl_data_version (
+    version_id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (version_id = 1),
+    data_version BIGINT NOT NULL DEFAULT 0,
+    committed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO etl_data_version (version_id) VALUES (1);
+
+-- Staging tables loaded by the Glue job and the micro-batch Lambda, then applied by
+-- upsert_orders_from_staging() and insert_order_items_from_staging()
+-- Truncated by each load; no constraints so a bad batch fails in the procedures, not the COPY
+CREATE TABLE IF NOT EXISTS temp_orders_staging (
+    order_id VARCHAR(50),
+    order_number VARCHAR(50),
+    created_on TIMESTAMP,
+    modified_on TIMESTAMP,
+    fulfilled_on TIMESTAMP,
+    customer_email VARCHAR(100),
+    customer_name VARCHAR(100),
+    shipping_city VARCHAR(100),
+    shipping_state VARCHAR(50),
+    shipping_country VARCHAR(50),
+    fulfillment_status VARCHAR(20),
+    discount_total NUMERIC(10,2),
+    refund_total NUMERIC(10,2),
+    order_total NUMERIC(10,2)
+);
+
+CREATE TABLE IF NOT EXISTS temp_order_items_staging (
+    order_id VARCHAR(50),
+    product_id VARCHAR(50),
+    product_sku VARCHAR(50),
+    product_name VARCHAR(255),
+    product_quantity SMALLINT,
+    product_price NUMERIC(10,2),
+    product_color VARCHAR(255)
+);
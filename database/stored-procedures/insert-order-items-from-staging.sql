@@ -0,0 +1,39 @@
+-- Inserts order items for orders that don't have any items yet
+-- Expects ETL to add incoming order item rows to a staging table (temp_order_items_staging by default)
+-- Runs after upsert_orders_from_staging() in the same transaction, so every order_id already exists
+-- Staging must hold the items of one version per order (the Glue job stages only the latest
+-- version's items, the micro-batch Lambda only fetches the latest version); orders that already
+-- have items are skipped, so re-running a batch never duplicates items
+
+-- Replaces the earlier zero-argument version (a second overload would make calls ambiguous)
+DROP FUNCTION IF EXISTS insert_order_items_from_staging();
+
+CREATE OR REPLACE FUNCTION insert_order_items_from_staging(staging_table TEXT DEFAULT 'temp_order_items_staging')
+RETURNS INTEGER AS $$
+DECLARE
+    rows_affected INTEGER := 0;
+BEGIN
+    -- Parallel replay chunks can stage the same order: take turns so NOT EXISTS sees committed items
+    PERFORM pg_advisory_xact_lock(hashtext('insert_order_items_from_staging'));
+
+    EXECUTE format($sql$
+        INSERT INTO order_items (
+            order_id, product_id, product_sku, product_name,
+            product_quantity, product_price, product_color
+        )
+        SELECT 
+            s.order_id, s.product_id, s.product_sku, s.product_name,
+            s.product_quantity, s.product_price, s.product_color
+        FROM %I s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM order_items oi WHERE oi.order_id = s.order_id
+        )
+    $sql$, staging_table);
+
+    -- Get the number of rows affected
+    GET DIAGNOSTICS rows_affected = ROW_COUNT;
+
+    -- Returns number of rows inserted (or 0 for none)
+    RETURN rows_affected;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,90 @@
+-- Recomputes the sales_rollup cells touched by a set of orders
+-- Called after upsert_orders_from_staging() and insert_order_items_from_staging() in the same
+-- transaction, with the order_ids of the staged batch: only the (period, SKU) cells containing
+-- those orders are rebuilt, reading only the orders inside those cells, so the cost follows the
+-- batch size rather than the order history
+-- Every shipping country/state of a touched (period, SKU) is rebuilt, so address changes move totals
+-- Passing NULL rebuilds the whole rollup (initial backfill)
+-- Canceled orders are left out of the totals; an order becoming canceled still refreshes its cells
+
+CREATE OR REPLACE FUNCTION refresh_sales_rollup(order_ids VARCHAR[] DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    rows_affected INTEGER := 0;
+BEGIN
+    -- Parallel replay chunks can touch the same cells: take turns so delete + insert don't collide
+    PERFORM pg_advisory_xact_lock(hashtext('sales_rollup'));
+
+    CREATE TEMP TABLE IF NOT EXISTS sales_rollup_touched (
+        period_grain VARCHAR(5),
+        period_start DATE,
+        product_sku VARCHAR(50)
+    ) ON COMMIT DELETE ROWS;
+    TRUNCATE sales_rollup_touched;
+
+    -- Cells containing the given orders, at every grain
+    INSERT INTO sales_rollup_touched (period_grain, period_start, product_sku)
+    SELECT DISTINCT g.period_grain, date_trunc(g.period_grain, o.created_on)::DATE, oi.product_sku
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.order_id
+    CROSS JOIN (VALUES ('day'), ('week'), ('month')) AS g(period_grain)
+    WHERE order_ids IS NULL OR o.order_id = ANY(order_ids);
+
+    DELETE FROM sales_rollup r
+    USING sales_rollup_touched t
+    WHERE r.period_grain = t.period_grain
+        AND r.period_start = t.period_start
+        AND r.product_sku = t.product_sku;
+
+    INSERT INTO sales_rollup (
+        period_grain, period_start, shipping_country, shipping_state, product_sku,
+        revenue, units, discount_total, refund_total, order_count
+    )
+    WITH candidate_orders AS (
+        -- Orders with a line in a touched cell: each cell's created_on range (idx_orders_created_on)
+        -- and SKU, so an old order in the batch reads its own periods, not the history since then
+        SELECT DISTINCT o.order_id
+        FROM sales_rollup_touched t
+        JOIN orders o
+            ON o.created_on >= t.period_start
+            AND o.created_on < t.period_start + ('1 ' || t.period_grain)::INTERVAL
+        JOIN order_items oi
+            ON oi.order_id = o.order_id
+            AND oi.product_sku = t.product_sku
+        WHERE lower(o.fulfillment_status) <> 'canceled'
+    ),
+    order_lines AS (
+        -- All lines of those orders, so each line's share of the order revenue is complete
+        SELECT
+            o.order_id, o.created_on,
+            COALESCE(o.shipping_country, 'Unknown') AS shipping_country,
+            COALESCE(o.shipping_state, 'Unknown') AS shipping_state,
+            oi.product_sku, oi.product_quantity,
+            oi.product_quantity * oi.product_price AS line_revenue,
+            SUM(oi.product_quantity * oi.product_price) OVER (PARTITION BY o.order_id) AS order_revenue,
+            o.discount_total, o.refund_total
+        FROM candidate_orders c
+        JOIN orders o ON o.order_id = c.order_id
+        JOIN order_items oi ON oi.order_id = o.order_id
+    )
+    SELECT
+        t.period_grain, t.period_start, l.shipping_country, l.shipping_state, l.product_sku,
+        SUM(l.line_revenue),
+        SUM(l.product_quantity),
+        SUM(CASE WHEN l.order_revenue > 0 THEN l.discount_total * l.line_revenue / l.order_revenue ELSE 0 END),
+        SUM(CASE WHEN l.order_revenue > 0 THEN l.refund_total * l.line_revenue / l.order_revenue ELSE 0 END),
+        COUNT(DISTINCT l.order_id)
+    FROM order_lines l
+    JOIN sales_rollup_touched t
+        ON t.product_sku = l.product_sku
+        AND t.period_start = date_trunc(t.period_grain, l.created_on)::DATE
+    GROUP BY t.period_grain, t.period_start, l.shipping_country, l.shipping_state, l.product_sku;
+
+    -- Get the number of rows affected
+    GET DIAGNOSTICS rows_affected = ROW_COUNT;
+
+    -- Returns number of rollup rows written (or 0 for none)
+    RETURN rows_affected;
+END;
+-- The touched-cell table is session-local and emptied on commit, so concurrent callers never share it.
+$$ LANGUAGE plpgsql;
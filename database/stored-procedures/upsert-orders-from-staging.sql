@@ -1,43 +1,94 @@
 -- Inserts new order rows and updates existing rows on conflict
--- Expects ETL to add new order table data to temp_orders_staging table
--- Return value of rows_affected is required for jdbc.read functionality in custom code Glue node
+-- Expects ETL to add new order table data to a staging table (temp_orders_staging by default)
+-- Replay mode passes a per-chunk staging table so chunks can load in parallel
+-- Return value of rows_affected is logged by the Glue job and micro-batch Lambda
+-- Status transitions (fulfillment_status, fulfilled_on, refund_total) are appended to order_status_log,
+-- unless log_status_changes is FALSE (replay: the transitions were logged when first loaded)
+-- Rows are applied in order_id order, so concurrent loads lock shared orders in the same order
+-- An older version of an order (by modified_on) never overwrites a newer one, so replays are idempotent
 
-CREATE OR REPLACE FUNCTION upsert_orders_from_staging()
+-- Replaces the earlier versions (a second overload would make calls ambiguous)
+DROP FUNCTION IF EXISTS upsert_orders_from_staging();
+DROP FUNCTION IF EXISTS upsert_orders_from_staging(TEXT);
+
+CREATE OR REPLACE FUNCTION upsert_orders_from_staging(
+    staging_table TEXT DEFAULT 'temp_orders_staging',
+    log_status_changes BOOLEAN DEFAULT TRUE
+)
 RETURNS INTEGER AS $$
 DECLARE
     rows_affected INTEGER := 0;
 BEGIN
-    INSERT INTO orders (
-        order_id, order_number, created_on, modified_on, fulfilled_on,
-        customer_email, customer_name, shipping_city, shipping_state, 
-        shipping_country, fulfillment_status, discount_total, refund_total, order_total
-    )
-    SELECT 
-        order_id, order_number, created_on, modified_on, fulfilled_on,
-        customer_email, customer_name, shipping_city, shipping_state, 
-        shipping_country, fulfillment_status, discount_total, refund_total, order_total
-    FROM temp_orders_staging
-    ON CONFLICT (order_id) DO UPDATE SET
-        order_number = EXCLUDED.order_number,
-        created_on = EXCLUDED.created_on,
-        modified_on = EXCLUDED.modified_on,
-        fulfilled_on = EXCLUDED.fulfilled_on,
-        customer_email = EXCLUDED.customer_email,
-        customer_name = EXCLUDED.customer_name,
-        shipping_city = EXCLUDED.shipping_city,
-        shipping_state = EXCLUDED.shipping_state,
-        shipping_country = EXCLUDED.shipping_country,
-        fulfillment_status = EXCLUDED.fulfillment_status,
-        discount_total = EXCLUDED.discount_total,
-        refund_total = EXCLUDED.refund_total,
-        order_total = EXCLUDED.order_total;
+    -- Capture status transitions before the upsert overwrites the previous values
+    IF log_status_changes THEN
+        EXECUTE format($sql$
+            INSERT INTO order_status_log (
+                order_id, change_type, previous_status, new_status,
+                previous_fulfilled_on, new_fulfilled_on, previous_refund_total, new_refund_total
+            )
+            SELECT
+                s.order_id,
+                CASE
+                    WHEN s.refund_total > COALESCE(o.refund_total, 0) THEN 'refunded'
+                    WHEN lower(s.fulfillment_status) = 'fulfilled'
+                        AND (o.order_id IS NULL OR lower(o.fulfillment_status) <> 'fulfilled') THEN 'fulfilled'
+                    WHEN lower(s.fulfillment_status) = 'pending'
+                        AND (o.order_id IS NULL OR lower(o.fulfillment_status) <> 'pending') THEN 'new_pending'
+                    ELSE 'status_change'
+                END,
+                o.fulfillment_status, s.fulfillment_status,
+                o.fulfilled_on, s.fulfilled_on,
+                o.refund_total, s.refund_total
+            FROM %I s
+            LEFT JOIN orders o ON o.order_id = s.order_id
+            WHERE o.order_id IS NULL
+                OR (
+                    s.modified_on >= o.modified_on
+                    AND (
+                        s.fulfillment_status IS DISTINCT FROM o.fulfillment_status
+                        OR s.fulfilled_on IS DISTINCT FROM o.fulfilled_on
+                        OR s.refund_total > o.refund_total
+                    )
+                )
+        $sql$, staging_table);
+    END IF;
+
+    EXECUTE format($sql$
+        INSERT INTO orders (
+            order_id, order_number, created_on, modified_on, fulfilled_on,
+            customer_email, customer_name, shipping_city, shipping_state, 
+            shipping_country, fulfillment_status, discount_total, refund_total, order_total
+        )
+        SELECT 
+            order_id, order_number, created_on, modified_on, fulfilled_on,
+            customer_email, customer_name, shipping_city, shipping_state, 
+            shipping_country, fulfillment_status, discount_total, refund_total, order_total
+        FROM %I
+        ORDER BY order_id
+        ON CONFLICT (order_id) DO UPDATE SET
+            order_number = EXCLUDED.order_number,
+            created_on = EXCLUDED.created_on,
+            modified_on = EXCLUDED.modified_on,
+            fulfilled_on = EXCLUDED.fulfilled_on,
+            customer_email = EXCLUDED.customer_email,
+            customer_name = EXCLUDED.customer_name,
+            shipping_city = EXCLUDED.shipping_city,
+            shipping_state = EXCLUDED.shipping_state,
+            shipping_country = EXCLUDED.shipping_country,
+            fulfillment_status = EXCLUDED.fulfillment_status,
+            discount_total = EXCLUDED.discount_total,
+            refund_total = EXCLUDED.refund_total,
+            order_total = EXCLUDED.order_total
+        WHERE EXCLUDED.modified_on >= orders.modified_on
+    $sql$, staging_table);
     
     -- Get the number of rows affected
     GET DIAGNOSTICS rows_affected = ROW_COUNT;
-    
+
     -- Returns number of rows updated (or 0 for none)
     RETURN rows_affected;
 END;
 -- Native procedural language: required for DECLARE (variable), BEGIN/END, and GET DIAGNOSTICS.
 -- Cannot simply return ROW_COUNT. We have to assign it to a variable to access outside of GET DIAGNOSTICS.
-$$ LANGUAGE plpgsql;
\ No newline at end of file
+-- EXECUTE format(... %I ...) quotes the staging table name as an identifier.
+$$ LANGUAGE plpgsql;
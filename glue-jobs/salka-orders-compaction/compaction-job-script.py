@@ -0,0 +1,216 @@
+import sys
+import json
+from datetime import datetime, timedelta
+from awsglue.utils import getResolvedOptions
+from pyspark.context import SparkContext
+from awsglue.context import GlueContext
+from awsglue.job import Job
+from pyspark.sql import Window
+from pyspark.sql import functions as SqlFuncs
+import boto3
+
+# Shared with the orders ETL replay (attached with --extra-py-files, see /shared)
+from salka_order_schema import RAW_ORDERS_FILE
+
+
+# Job Parameters (all optional)
+def GetCompactionArgs():
+    defaults = {
+        "S3_BUCKET": "salka-designs",
+        "PROCESSED_ORDER_FOLDER": "orders/processed/",
+        "HISTORY_FOLDER": "orders/history/",
+        # YYYY/MM (month) or YYYY/MM/DD (day); defaults to the previous month
+        "COMPACTION_PERIOD": (datetime.now().replace(day=1) - timedelta(days=1)).strftime(
+            "%Y/%m"
+        ),
+    }
+
+    # getResolvedOptions fails on missing arguments, so only resolve the ones that were passed
+    passed = [key for key in defaults if f"--{key}" in sys.argv]
+    if passed:
+        defaults.update(getResolvedOptions(sys.argv, passed))
+    return defaults
+
+
+def ListKeys(s3, bucket, prefix):
+    keys = []
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            if not obj["Key"].endswith("/"):
+                keys.append((obj["Key"], obj["Size"]))
+    return keys
+
+
+def ReadOrders(spark, paths):
+    # One row per order version, with typed timestamps and the order date partition column
+    return (
+        spark.read.schema(RAW_ORDERS_FILE)
+        .json(paths)
+        .select(
+            SqlFuncs.explode("result").alias("order"),
+            SqlFuncs.input_file_name().alias("source_file"),
+        )
+        .select("order.*", "source_file")
+        .filter(SqlFuncs.col("id").isNotNull() & SqlFuncs.col("createdOn").isNotNull())
+        .withColumn("created_on", SqlFuncs.to_timestamp("createdOn"))
+        .withColumn("modified_on", SqlFuncs.to_timestamp("modifiedOn"))
+        .withColumn("order_date", SqlFuncs.to_date("created_on"))
+    )
+
+
+def LatestPerOrder(orders_df):
+    # Keep the most recently modified version of each order (one shuffle by id, no global sort)
+    latest_first = Window.partitionBy("id").orderBy(SqlFuncs.col("modified_on").desc())
+    return (
+        orders_df.withColumn("_row_number", SqlFuncs.row_number().over(latest_first))
+        .filter(SqlFuncs.col("_row_number") == 1)
+        .drop("_row_number")
+    )
+
+
+def PublishPartitions(s3, bucket, staging_prefix, history_prefix, partitions, run_id):
+    # Copy each rewritten partition from staging into the history folder next to the files it
+    # replaces (names prefixed with run_id, so nothing live is overwritten), then clear staging
+    written = {}
+    for partition in partitions:
+        target_prefix = f"{history_prefix}order_date={partition}/"
+
+        written[partition] = []
+        for key, size in ListKeys(s3, bucket, f"{staging_prefix}order_date={partition}/"):
+            target_key = f"{target_prefix}{run_id}-{key.split('/')[-1]}"
+            s3.copy_object(
+                Bucket=bucket, Key=target_key, CopySource={"Bucket": bucket, "Key": key}
+            )
+            written[partition].append({"key": target_key, "bytes": size})
+
+    # Spark's _SUCCESS marker and anything else left in staging
+    for key, _ in ListKeys(s3, bucket, staging_prefix):
+        s3.delete_object(Bucket=bucket, Key=key)
+
+    return written
+
+
+def RemoveStaleFiles(s3, bucket, history_prefix, written):
+    # After the manifest is written: drop the files in each rewritten partition it no longer lists
+    # A failure before this point leaves the old files in place alongside the new ones
+    removed = 0
+    for partition, files in written.items():
+        current_keys = {file["key"] for file in files}
+        for key, _ in ListKeys(s3, bucket, f"{history_prefix}order_date={partition}/"):
+            if key not in current_keys:
+                s3.delete_object(Bucket=bucket, Key=key)
+                removed += 1
+    return removed
+
+
+args = getResolvedOptions(sys.argv, ["JOB_NAME"])
+sc = SparkContext()
+glueContext = GlueContext(sc)
+spark = glueContext.spark_session
+job = Job(glueContext)
+job.init(args["JOB_NAME"], args)
+
+compaction_args = GetCompactionArgs()
+S3_BUCKET = compaction_args["S3_BUCKET"]
+PROCESSED_ORDER_FOLDER = compaction_args["PROCESSED_ORDER_FOLDER"]
+HISTORY_FOLDER = compaction_args["HISTORY_FOLDER"]
+COMPACTION_PERIOD = compaction_args["COMPACTION_PERIOD"].strip("/")
+
+run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+history_path = f"s3://{S3_BUCKET}/{HISTORY_FOLDER}"
+staging_prefix = f"{HISTORY_FOLDER}_staging/{run_id}/"
+
+print(f"### COMPACTION - Period {COMPACTION_PERIOD} ###")
+
+s3 = boto3.client("s3")
+source_files = ListKeys(s3, S3_BUCKET, f"{PROCESSED_ORDER_FOLDER}{COMPACTION_PERIOD}/")
+source_files = [(key, size) for key, size in source_files if key.endswith(".json")]
+
+if not source_files:
+    print("### COMPACTION - No archived order files for this period ###")
+else:
+    print(f"### COMPACTION - Reading {len(source_files)} archived order files ###")
+    new_orders_df = ReadOrders(
+        spark, [f"s3://{S3_BUCKET}/{key}" for key, _ in source_files]
+    )
+
+    # Order dates touched by this period; only these history partitions are rewritten
+    touched_partitions = sorted(
+        str(row["order_date"])
+        for row in new_orders_df.select("order_date").distinct().collect()
+    )
+
+    # Merge with what history already holds for those dates (orders modified in a later period)
+    combined_df = new_orders_df
+    if ListKeys(s3, S3_BUCKET, f"{HISTORY_FOLDER}order_date="):
+        existing_df = (
+            spark.read.parquet(history_path)
+            .filter(SqlFuncs.col("order_date").cast("string").isin(touched_partitions))
+        )
+        combined_df = new_orders_df.unionByName(
+            existing_df.select(*new_orders_df.columns)
+        )
+
+    compacted_df = LatestPerOrder(combined_df).withColumn(
+        "compacted_at", SqlFuncs.lit(run_id)
+    )
+
+    # Staged first: the partitions being rewritten are also being read
+    # One file per order date keeps history reads to a few large sequential scans
+    (
+        compacted_df.repartition("order_date")
+        .sortWithinPartitions("created_on")
+        .write.mode("overwrite")
+        .partitionBy("order_date")
+        .parquet(f"s3://{S3_BUCKET}/{staging_prefix}")
+    )
+
+    partition_counts = {
+        str(row["order_date"]): row["count"]
+        for row in spark.read.parquet(f"s3://{S3_BUCKET}/{staging_prefix}")
+        .groupBy("order_date")
+        .count()
+        .collect()
+    }
+
+    written = PublishPartitions(
+        s3, S3_BUCKET, staging_prefix, HISTORY_FOLDER, touched_partitions, run_id
+    )
+
+    # Manifest: what was read, what each rewritten partition now holds
+    manifest = {
+        "period": COMPACTION_PERIOD,
+        "run_id": run_id,
+        "source_files": len(source_files),
+        "source_bytes": sum(size for _, size in source_files),
+        "source_keys": [key for key, _ in source_files],
+        "orders": sum(partition_counts.values()),
+        "partitions": [
+            {
+                "order_date": partition,
+                "orders": partition_counts.get(partition, 0),
+                "files": written.get(partition, []),
+            }
+            for partition in touched_partitions
+        ],
+    }
+    manifest_key = (
+        f"{HISTORY_FOLDER}_manifests/{COMPACTION_PERIOD.replace('/', '-')}_{run_id}.json"
+    )
+    s3.put_object(
+        Bucket=S3_BUCKET,
+        Key=manifest_key,
+        Body=json.dumps(manifest, indent=2),
+        ContentType="application/json",
+    )
+
+    removed = RemoveStaleFiles(s3, S3_BUCKET, HISTORY_FOLDER, written)
+
+    print(
+        f"### COMPACTION - {len(source_files)} files → {manifest['orders']} orders in "
+        f"{len(touched_partitions)} partitions ({removed} stale files removed), "
+        f"manifest s3://{S3_BUCKET}/{manifest_key} ###"
+    )
+
+job.commit()
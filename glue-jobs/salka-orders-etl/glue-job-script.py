@@ -11,20 +11,98 @@ from awsglue import DynamicFrame
 from pyspark.sql import functions as SqlFuncs
 
 
-# Script generated for node Save Orders to RDS
-def SaveOrdersToRDSTransform(glueContext, dfc) -> DynamicFrameCollection:
-    from awsglue.dynamicframe import DynamicFrame, DynamicFrameCollection
-    from awsglue.utils import getResolvedOptions
-    from pyspark.sql.functions import col
-    from pyspark.sql.types import TimestampType
+# Resolve optional job parameters, falling back to defaults for any that weren't passed
+def GetOptionalJobArgs(defaults):
+    # getResolvedOptions fails on missing arguments, so only resolve the ones that were passed
+    passed = [key for key in defaults if f"--{key}" in sys.argv]
+    resolved = dict(defaults)
+    if passed:
+        resolved.update(getResolvedOptions(sys.argv, passed))
+    return resolved
+
+
+# Job-level Spark/JDBC tuning, overridable with optional job parameters (e.g. --JDBC_MAX_CONNECTIONS 8)
+def GetJobTuning():
+    defaults = {
+        # Adaptive query execution: coalesces small shuffle partitions and splits skewed ones
+        "ADAPTIVE_EXECUTION": "true",
+        # Target input bytes per shuffle partition
+        "TARGET_PARTITION_MB": "128",
+        # Upper bound on derived shuffle partitions (lower bound is the cluster's parallelism)
+        "MAX_SHUFFLE_PARTITIONS": "400",
+        # Concurrent JDBC writers - keep well below the RDS instance max_connections
+        "JDBC_MAX_CONNECTIONS": "4",
+        # Rows per JDBC insert batch
+        "JDBC_BATCH_SIZE": "5000",
+    }
+
+    tuning = GetOptionalJobArgs(defaults)
+
+    return {
+        "adaptive_execution": tuning["ADAPTIVE_EXECUTION"].lower() == "true",
+        "target_partition_bytes": int(tuning["TARGET_PARTITION_MB"]) * 1024 * 1024,
+        "max_shuffle_partitions": int(tuning["MAX_SHUFFLE_PARTITIONS"]),
+        "jdbc_max_connections": int(tuning["JDBC_MAX_CONNECTIONS"]),
+        "jdbc_batch_size": int(tuning["JDBC_BATCH_SIZE"]),
+    }
+
+
+# Size shuffles from the input and the worker count instead of the fixed default (200)
+# input_paths: one S3 prefix or a list of them (replay reads several archive days)
+def ConfigureSparkTuning(spark, tuning, input_paths):
     import boto3
-    from botocore.exceptions import ClientError
-    from datetime import datetime
-    import json
-    import sys
-    import traceback
+    import math
+
+    if isinstance(input_paths, str):
+        input_paths = [input_paths]
+
+    # Total bytes of the JSON files this run will read
+    input_bytes = 0
+    paginator = boto3.client("s3").get_paginator("list_objects_v2")
+    for input_path in input_paths:
+        bucket, _, prefix = input_path.replace("s3://", "").partition("/")
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            input_bytes += sum(obj["Size"] for obj in page.get("Contents", []))
+
+    # At least one partition per executor core, at most max_shuffle_partitions
+    parallelism = spark.sparkContext.defaultParallelism
+    derived_partitions = math.ceil(input_bytes / tuning["target_partition_bytes"])
+    shuffle_partitions = min(
+        max(derived_partitions, parallelism), tuning["max_shuffle_partitions"]
+    )
 
-    # Job Parmaeters
+    adaptive = "true" if tuning["adaptive_execution"] else "false"
+    spark.conf.set("spark.sql.adaptive.enabled", adaptive)
+    spark.conf.set("spark.sql.adaptive.coalescePartitions.enabled", adaptive)
+    spark.conf.set("spark.sql.adaptive.skewJoin.enabled", adaptive)
+    spark.conf.set(
+        "spark.sql.adaptive.advisoryPartitionSizeInBytes",
+        str(tuning["target_partition_bytes"]),
+    )
+    spark.conf.set("spark.sql.shuffle.partitions", str(shuffle_partitions))
+
+    print(
+        f"### SPARK TUNING - {input_bytes} input bytes, {parallelism} cores, "
+        f"{shuffle_partitions} shuffle partitions, adaptive execution {adaptive} ###"
+    )
+    return shuffle_partitions
+
+
+# Keep the most recently modified row per key (one shuffle by key, no global sort)
+def LatestPerKey(dataframe, key, order_column):
+    from pyspark.sql import Window
+    from pyspark.sql.functions import col, row_number
+
+    latest_first = Window.partitionBy(key).orderBy(col(order_column).desc())
+    return (
+        dataframe.withColumn("_row_number", row_number().over(latest_first))
+        .filter(col("_row_number") == 1)
+        .drop("_row_number")
+    )
+
+
+# RDS job parameters, with fallback values for data preview
+def GetDatabaseArgs():
     try:
         args = getResolvedOptions(
             sys.argv,
@@ -32,76 +110,75 @@ def SaveOrdersToRDSTransform(glueContext, dfc) -> DynamicFrameCollection:
                 "RDS_SECRET_NAME",
                 "AWS_REGION",
                 "STAGING_ORDERS_TABLE",
-                "ORDER_ITEMS_TABLE",
             ],
         )
-        RDS_SECRET_NAME = args["RDS_SECRET_NAME"]
-        AWS_REGION = args["AWS_REGION"]
-        STAGING_ORDERS_TABLE = args["STAGING_ORDERS_TABLE"]
-        ORDER_ITEMS_TABLE = args["ORDER_ITEMS_TABLE"]
     except:
         # Fallback values for data preview
-        RDS_SECRET_NAME = "salka-rds-credentials"
-        AWS_REGION = "us-east-1"
-        STAGING_ORDERS_TABLE = "temp_orders_staging"
-        ORDER_ITEMS_TABLE = "order_items"
+        args = {
+            "RDS_SECRET_NAME": "salka-rds-credentials",
+            "AWS_REGION": "us-east-1",
+            "STAGING_ORDERS_TABLE": "temp_orders_staging",
+        }
         print("### Using fallback values for preview mode ###")
 
-    print("### ORDERS TRANSFORM - Upsert Orders ###")
-
-    # Get the DynamicFrame from the collection
-    keys = list(dfc.keys())
-    df = dfc.select(keys[0])
-    dataframe = df.toDF()
-    input_df = dataframe
-
-    # Get Spark session
-    spark = glueContext.spark_session
-
-    # Define helper functions
-    def get_max_date_from_database():
-        # Join order_items with orders to get the created_on timestamp
-        max_date_query = f"""
-            SELECT COALESCE(MAX(o.created_on), '1900-01-01'::timestamp) as max_date 
-            FROM {ORDER_ITEMS_TABLE} oi 
-            JOIN orders o ON oi.order_id = o.order_id
-        """
-
-        result_df = (
-            spark.read.format("jdbc")
-            .option("url", jdbc_url)
-            .option("user", username)
-            .option("password", password)
-            .option("driver", "org.postgresql.Driver")
-            .option("query", max_date_query)
-            .load()
+    args.update(
+        GetOptionalJobArgs({"STAGING_ORDER_ITEMS_TABLE": "temp_order_items_staging"})
+    )
+    return args
+
+
+# Driver-side session for control statements plus Spark JDBC write settings
+# jdbc_connections is the writer budget for each staging write
+def ConnectToRDS(spark, db_args, pool_size, jdbc_connections):
+    # Shared modules, attached with --extra-py-files (see /shared and glue_db_session.py)
+    import salka_secrets
+    from glue_db_session import GlueDatabaseSession
+
+    RDS_SECRET_NAME = db_args["RDS_SECRET_NAME"]
+    AWS_REGION = db_args["AWS_REGION"]
+
+    def get_jdbc_url(credentials):
+        # reWriteBatchedInserts lets the driver send each insert batch as multi-row statements
+        return f"jdbc:postgresql://{credentials['host']}:{credentials['port']}/{credentials['dbName']}?reWriteBatchedInserts=true"
+
+    def open_database_session(credentials):
+        session = GlueDatabaseSession(
+            spark,
+            get_jdbc_url(credentials),
+            credentials["username"],
+            credentials["password"],
+            pool_size=pool_size,
         )
-
-        return result_df.collect()[0]["max_date"]
-
-    def get_database_secrets():
-        try:
-            client = boto3.client("secretsmanager", region_name=AWS_REGION)
-            response = client.get_secret_value(SecretId=RDS_SECRET_NAME)
-            print(f"### Successfully retrieved credentials for database ###")
-            return json.loads(response["SecretString"])
-
-        except ClientError as e:
-            statement = "Failed to retrieve database credentials from Secrets Manager"
-            raise Exception(f"ERROR: {statement} : {e}")
-
-    # Database connection
-    db_credentials = get_database_secrets()
-    jdbc_url = f"jdbc:postgresql://{db_credentials['host']}:{db_credentials['port']}/{db_credentials['dbName']}"
-    username = db_credentials["username"]
-    password = db_credentials["password"]
+        session.validate()
+        # Credentials that opened the session, reused for the Spark JDBC writes
+        return session, credentials
+
+    # Database connection: one secret lookup (cached by salka_secrets, so later transforms in this
+    # run reuse it), refetched once if it was rotated
+    salka_secrets.configure(region=AWS_REGION, rds_secret_name=RDS_SECRET_NAME)
+    session, db_credentials = salka_secrets.call_with_secret_refresh(
+        RDS_SECRET_NAME, open_database_session
+    )
+    print("### Successfully retrieved credentials for database ###")
 
     jdbc_properties = {
-        "user": username,
-        "password": password,
+        "user": db_credentials["username"],
+        "password": db_credentials["password"],
         "driver": "org.postgresql.Driver",
+        "numPartitions": str(max(1, jdbc_connections)),
+        "batchsize": str(GetJobTuning()["jdbc_batch_size"]),
+        # Keep the staging tables (and their grants) - truncate instead of drop/create
+        "truncate": "true",
     }
 
+    return session, get_jdbc_url(db_credentials), jdbc_properties
+
+
+# Split flattened rows into staging orders (latest version per order) and order items
+def PrepareOrderFrames(dataframe):
+    from pyspark.sql.functions import col
+    from pyspark.sql.types import TimestampType
+
     # Select required orders columns
     orders_df = dataframe.select(
         "order_id",
@@ -120,18 +197,6 @@ def SaveOrdersToRDSTransform(glueContext, dfc) -> DynamicFrameCollection:
         "order_total",
     )
 
-    # Select required order item columns (include created_on for metadata)
-    order_items_df = dataframe.select(
-        "order_id",
-        "created_on",
-        "product_id",
-        "product_sku",
-        "product_name",
-        "product_quantity",
-        "product_price",
-        "product_color",
-    )
-
     # Ensure timestamps are properly formatted
     orders_df = orders_df.withColumn(
         "created_on", col("created_on").cast(TimestampType())
@@ -142,94 +207,221 @@ def SaveOrdersToRDSTransform(glueContext, dfc) -> DynamicFrameCollection:
     orders_df = orders_df.withColumn(
         "fulfilled_on", col("fulfilled_on").cast(TimestampType())
     )
-    order_items_df = order_items_df.withColumn(
-        "created_on", col("created_on").cast(TimestampType())
-    )
 
-    try:
-        # 1 - Remove duplicate rows, keeping most recently modified
-        staging_orders_df = orders_df.orderBy(col("modified_on").desc()).dropDuplicates(
-            ["order_id"]
+    # Remove duplicate rows, keeping most recently modified
+    staging_orders_df = LatestPerKey(orders_df, "order_id", "modified_on")
+
+    # Line items of the latest version only: a batch holding several versions of one order
+    # would otherwise stage (and insert) its items once per version
+    latest_versions_df = staging_orders_df.select("order_id", "modified_on")
+    order_items_df = (
+        dataframe.withColumn("modified_on", col("modified_on").cast(TimestampType()))
+        .join(latest_versions_df, ["order_id", "modified_on"])
+        .select(
+            "order_id",
+            "product_id",
+            "product_sku",
+            "product_name",
+            "product_quantity",
+            "product_price",
+            "product_color",
         )
+    )
 
-        # 2 - Write incoming orders to staging table
-        print(f"### Writing {staging_orders_df.count()} rows to staging table ###")
-
-        staging_orders_df.write.jdbc(
+    return staging_orders_df, order_items_df
+
+
+# Load orders and order items: concurrent staging writes, then one transaction on the driver
+# log_status_changes=False skips the order_status_log entries (replays of already-logged history)
+def LoadOrdersToRDS(
+    session,
+    staging_orders_df,
+    staging_items_df,
+    jdbc_url,
+    jdbc_properties,
+    staging_orders_table,
+    staging_items_table,
+    log_status_changes=True,
+):
+    from concurrent.futures import ThreadPoolExecutor
+    import time
+    from salka_orders import staging_lock_sql, staging_unlock_sql
+    from salka_reports import BUMP_DATA_VERSION_SQL
+
+    # A deadlock with another loader rolls back the whole transaction; staging is intact, so retry it
+    deadlock_retries = 3
+
+    def write_staging(staging_df, table):
+        staging_df.write.jdbc(
             url=jdbc_url,
-            table=STAGING_ORDERS_TABLE,
+            table=table,
             mode="overwrite",
             properties=jdbc_properties,
         )
+        print(f"### Successfully wrote data to {table} ###")
 
-        print("### Successfully wrote data to staging table ###")
+    # Staging tables are shared with the webhook micro-batch Lambda - hold its lock for the whole load
+    with session.connection() as lock_conn:
+        session.query(staging_lock_sql(staging_orders_table, transaction=False), lock_conn)
+        try:
+            # 1 - Orders and items staging tables are independent Spark jobs, so write them concurrently
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                writes = [
+                    executor.submit(write_staging, staging_orders_df, staging_orders_table),
+                    executor.submit(write_staging, staging_items_df, staging_items_table),
+                ]
+                for write in writes:
+                    write.result()
+
+            # 2 - Upsert orders, insert their items and refresh the rollup together: all commit or none do
+            print("### Executing stored procedures ###")
+            log_flag = "TRUE" if log_status_changes else "FALSE"
+            upsert_sql = f"SELECT upsert_orders_from_staging('{staging_orders_table}', {log_flag})"
+            items_sql = f"SELECT insert_order_items_from_staging('{staging_items_table}')"
+            # Rebuild only the sales rollup cells containing this batch's orders
+            rollup_sql = (
+                f"SELECT refresh_sales_rollup(ARRAY(SELECT order_id FROM {staging_orders_table}))"
+            )
+            for attempt in range(deadlock_retries + 1):
+                try:
+                    with session.transaction() as conn:
+                        rows_modified = session.query_scalar(upsert_sql, conn)
+                        items_inserted = session.query_scalar(items_sql, conn)
+                        rollup_rows = session.query_scalar(rollup_sql, conn)
+                        # New data version for cached reports - last, so the row lock is brief
+                        if rows_modified or items_inserted:
+                            session.execute(BUMP_DATA_VERSION_SQL, conn)
+                    break
+                except Exception as e:
+                    if session.sql_state(e) != "40P01" or attempt == deadlock_retries:
+                        raise
+                    print(f"### Deadlock loading {staging_orders_table}, retry {attempt + 1} ###")
+                    time.sleep(2**attempt)
+            print(f"### Refreshed {rollup_rows} sales rollup rows ###")
+
+        finally:
+            session.query(staging_unlock_sql(staging_orders_table), lock_conn)
+
+    return rows_modified, items_inserted
+
+
+# DB diagnostics around the load (salka_db_diagnostics, attached with --extra-py-files)
+# Returns the "before" snapshot, or None when disabled; diagnostics never fail the job
+def StartDiagnostics(session):
+    diagnostics_args = GetOptionalJobArgs({"DB_DIAGNOSTICS": "true"})
+    if diagnostics_args["DB_DIAGNOSTICS"].lower() != "true":
+        return None
+    try:
+        import salka_db_diagnostics
+
+        return salka_db_diagnostics.snapshot(session.query, "before")
+    except Exception as e:
+        print(f"### DB diagnostics unavailable: {str(e)} ###")
+        return None
 
-        # 3 - Run stored procedure, returning rows modified
-        print("### Executing stored procedure ###")
 
-        result_df = (
-            spark.read.format("jdbc")
-            .option("url", jdbc_url)
-            .option("user", username)
-            .option("password", password)
-            .option("driver", "org.postgresql.Driver")
-            .option("query", "SELECT upsert_orders_from_staging() as rows_modified")
-            .load()
+# Snapshot after the load, explain the report queries on the fresh data and save next to the
+# reports; DB_EXPLAIN_ANALYZE=true adds timings (EXPLAIN ANALYZE runs each query again)
+def FinishDiagnostics(session, before, run_type="etl"):
+    if before is None:
+        return
+    try:
+        import boto3
+        import salka_db_diagnostics
+
+        diagnostics_args = GetOptionalJobArgs(
+            {
+                "DIAGNOSTICS_BUCKET": "salka-reports",
+                "DIAGNOSTICS_PREFIX": "reports",
+                "DB_EXPLAIN_ANALYZE": "false",
+            }
         )
+        bucket = diagnostics_args["DIAGNOSTICS_BUCKET"]
+        prefix = diagnostics_args["DIAGNOSTICS_PREFIX"]
+        analyze = diagnostics_args["DB_EXPLAIN_ANALYZE"].lower() == "true"
+
+        s3 = boto3.client("s3")
+        previous = salka_db_diagnostics.load_previous(s3, bucket, prefix, run_type)
+        diagnostics = salka_db_diagnostics.build_diagnostics(
+            session.query, run_type, before, previous, analyze=analyze
+        )
+        salka_db_diagnostics.save_diagnostics(s3, bucket, prefix, diagnostics)
+    except Exception as e:
+        print(f"### DB diagnostics failed: {str(e)} ###")
 
-        # 4 - Print result to logs
-        rows_modified = result_df.collect()[0]["rows_modified"]
 
-        print(f"### Successfully processed {rows_modified} rows ###")
-        print("### ORDERS TRANSFORM - Completed successfully ###")
+# Script generated for node Save Orders to RDS
+def SaveOrdersToRDSTransform(glueContext, dfc) -> DynamicFrameCollection:
+    from awsglue.dynamicframe import DynamicFrame, DynamicFrameCollection
+    import traceback
 
-    except Exception as e:
-        print(f"### ERROR in ORDERS TRANSFORM: {str(e)} ###")
-        print("### Full traceback: ###")
-        print(traceback.format_exc())
+    # Job Parmaeters
+    db_args = GetDatabaseArgs()
+    STAGING_ORDERS_TABLE = db_args["STAGING_ORDERS_TABLE"]
+    STAGING_ORDER_ITEMS_TABLE = db_args["STAGING_ORDER_ITEMS_TABLE"]
 
-        # Re-raise exception to fail job if needed
-        raise e
+    print("### ORDERS TRANSFORM - Upsert Orders ###")
 
-    try:
-        print(f"### Saving Order Items ###")
-        # Only add new order_item rows
-        last_processed_timestamp = get_max_date_from_database()
-        new_order_items_df = order_items_df.filter(
-            col("created_on") > last_processed_timestamp
-        )
+    # Get the DynamicFrame from the collection
+    keys = list(dfc.keys())
+    df = dfc.select(keys[0])
+    dataframe = df.toDF()
+    input_df = dataframe
 
-        print(f"### Total order items: {order_items_df.count()} ###")
-        print(f"### New order items to insert: {new_order_items_df.count()} ###")
+    # Orders and items below both read this frame and count it several times - compute it once
+    dataframe.persist()
 
-        # 3 - Insert new items
-        if new_order_items_df.count() > 0:
+    # Get Spark session
+    spark = glueContext.spark_session
 
-            # Drop created_on column
-            final_items_df = new_order_items_df.drop("created_on")
+    # Two pooled driver connections (staging lock + transaction); the two staging writes run at
+    # once, so each gets half of the JDBC connection budget
+    session, jdbc_url, jdbc_properties = ConnectToRDS(
+        spark,
+        db_args,
+        pool_size=2,
+        jdbc_connections=GetJobTuning()["jdbc_max_connections"] // 2,
+    )
 
-            final_items_df.write.jdbc(
-                url=jdbc_url,
-                table=ORDER_ITEMS_TABLE,
-                mode="append",
-                properties=jdbc_properties,
-            )
+    try:
+        # 1 - Orders (latest version per order) and order items
+        staging_orders_df, order_items_df = PrepareOrderFrames(dataframe)
 
-            print(
-                f"### Successfully inserted {new_order_items_df.count()} order items ###"
-            )
-        else:
-            # No new order items to save
-            print("### No new order items to insert ###")
+        print(f"### Writing {staging_orders_df.count()} rows to staging table ###")
+        print(f"### Writing {order_items_df.count()} order items to staging table ###")
+
+        diagnostics_before = StartDiagnostics(session)
+
+        # 2 - Load both staging tables, then upsert orders and insert new items in one transaction
+        rows_modified, items_inserted = LoadOrdersToRDS(
+            session,
+            staging_orders_df,
+            order_items_df,
+            jdbc_url,
+            jdbc_properties,
+            STAGING_ORDERS_TABLE,
+            STAGING_ORDER_ITEMS_TABLE,
+        )
+
+        # 3 - Print result to logs
+        print(f"### Successfully processed {rows_modified} rows ###")
+        print(f"### Successfully inserted {items_inserted} order items ###")
+
+        # 4 - Database performance capture for this load
+        FinishDiagnostics(session, diagnostics_before)
+        print("### ORDERS TRANSFORM - Completed successfully ###")
 
     except Exception as e:
-        print(f"### ERROR in ORDER ITEMS TRANSFORM: {str(e)} ###")
+        print(f"### ERROR in ORDERS TRANSFORM: {str(e)} ###")
         print("### Full traceback: ###")
         print(traceback.format_exc())
 
-        # Re-raise the exception to fail the job if needed
+        # Re-raise exception to fail job if needed
         raise e
 
+    finally:
+        session.close()
+
     # Create output dynamic frame
     output_dynamic_frame = DynamicFrame.fromDF(input_df, glueContext, "output")
 
@@ -237,6 +429,138 @@ def SaveOrdersToRDSTransform(glueContext, dfc) -> DynamicFrameCollection:
     return DynamicFrameCollection({"output_frame": output_dynamic_frame}, glueContext)
 
 
+# Replay archived orders for a date range (RUN_MODE=replay)
+# The range is split into chunks that flatten in parallel and load through the idempotent upsert
+# path, each with its own staging tables; at most REPLAY_MAX_DB_CONCURRENCY chunks load at once
+def ReplayArchivedOrders(glueContext, flatten_query):
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import datetime, timedelta
+    import threading
+    import boto3
+    from salka_order_schema import RAW_ORDERS_FILE
+
+    spark = glueContext.spark_session
+    replay_args = GetOptionalJobArgs(
+        {
+            "REPLAY_START_DATE": "",
+            "REPLAY_END_DATE": datetime.now().strftime("%Y-%m-%d"),
+            "REPLAY_CHUNK_DAYS": "7",
+            "REPLAY_MAX_DB_CONCURRENCY": "2",
+            "S3_BUCKET": "salka-designs",
+            "PROCESSED_ORDER_FOLDER": "orders/processed/",
+        }
+    )
+    if not replay_args["REPLAY_START_DATE"]:
+        raise ValueError("RUN_MODE=replay requires --REPLAY_START_DATE (YYYY-MM-DD)")
+
+    start_date = datetime.strptime(replay_args["REPLAY_START_DATE"], "%Y-%m-%d")
+    end_date = datetime.strptime(replay_args["REPLAY_END_DATE"], "%Y-%m-%d")
+    chunk_days = int(replay_args["REPLAY_CHUNK_DAYS"])
+    max_db_concurrency = int(replay_args["REPLAY_MAX_DB_CONCURRENCY"])
+    bucket = replay_args["S3_BUCKET"]
+    processed_folder = replay_args["PROCESSED_ORDER_FOLDER"]
+
+    print(
+        f"### REPLAY - {start_date:%Y-%m-%d} to {end_date:%Y-%m-%d} from s3://{bucket}/{processed_folder} ###"
+    )
+
+    # Archive days (orders/processed/YYYY/MM/DD/) that have files
+    s3 = boto3.client("s3")
+    day_prefixes = []
+    day = start_date
+    while day <= end_date:
+        prefix = f"{processed_folder}{day:%Y/%m/%d}/"
+        if s3.list_objects_v2(Bucket=bucket, Prefix=prefix, MaxKeys=1).get("KeyCount"):
+            day_prefixes.append(prefix)
+        day += timedelta(days=1)
+
+    if not day_prefixes:
+        print("### REPLAY - No archived order files in range ###")
+        return
+
+    chunks = [
+        day_prefixes[start : start + chunk_days]
+        for start in range(0, len(day_prefixes), chunk_days)
+    ]
+    print(f"### REPLAY - {len(day_prefixes)} archive days in {len(chunks)} chunks ###")
+
+    tuning = GetJobTuning()
+    ConfigureSparkTuning(
+        spark, tuning, [f"s3://{bucket}/{prefix}" for prefix in day_prefixes]
+    )
+
+    # Each loading chunk holds two pooled connections (staging lock + transaction) and writes two
+    # staging tables, so the JDBC writer budget is shared across all concurrent loads
+    db_args = GetDatabaseArgs()
+    session, jdbc_url, jdbc_properties = ConnectToRDS(
+        spark,
+        db_args,
+        pool_size=2 * max_db_concurrency,
+        jdbc_connections=tuning["jdbc_max_connections"] // (2 * max_db_concurrency),
+    )
+    db_slots = threading.Semaphore(max_db_concurrency)
+
+    def replay_chunk(index, prefixes):
+        # Flatten with the same SQL as the incremental path, under a per-chunk view name
+        # Declared schema: every chunk reads the same columns without an inference pass over its files
+        view_name = f"order_data_replay_{index}"
+        spark.read.schema(RAW_ORDERS_FILE).json(
+            [f"s3://{bucket}/{prefix}" for prefix in prefixes]
+        ).createOrReplaceTempView(view_name)
+        flattened_df = spark.sql(
+            flatten_query.replace("FROM order_data", f"FROM {view_name}")
+        ).dropDuplicates()
+        flattened_df.persist()
+
+        staging_orders_df, order_items_df = PrepareOrderFrames(flattened_df)
+        order_count = staging_orders_df.count()
+
+        # Spark work above runs freely; only the database load is bounded
+        staging_orders_table = f"temp_orders_staging_replay_{index}"
+        staging_items_table = f"temp_order_items_staging_replay_{index}"
+        try:
+            with db_slots:
+                # Status changes were logged when these orders were first loaded
+                rows_modified, items_inserted = LoadOrdersToRDS(
+                    session,
+                    staging_orders_df,
+                    order_items_df,
+                    jdbc_url,
+                    jdbc_properties,
+                    staging_orders_table,
+                    staging_items_table,
+                    log_status_changes=False,
+                )
+        finally:
+            session.execute(
+                f"DROP TABLE IF EXISTS {staging_orders_table}, {staging_items_table}"
+            )
+            flattened_df.unpersist()
+            spark.catalog.dropTempView(view_name)
+
+        print(
+            f"### REPLAY - Chunk {index} ({prefixes[0]} .. {prefixes[-1]}): {order_count} orders, "
+            f"{rows_modified} upserted, {items_inserted} items inserted ###"
+        )
+        return rows_modified, items_inserted
+
+    try:
+        # Extra workers let the next chunks flatten while others hold the database slots
+        with ThreadPoolExecutor(max_workers=2 * max_db_concurrency) as executor:
+            results = [
+                executor.submit(replay_chunk, index, prefixes)
+                for index, prefixes in enumerate(chunks)
+            ]
+            totals = [result.result() for result in results]
+    finally:
+        session.close()
+
+    print(
+        f"### REPLAY - Completed: {sum(t[0] for t in totals)} orders upserted, "
+        f"{sum(t[1] for t in totals)} order items inserted ###"
+    )
+
+
 def sparkSqlQuery(glueContext, query, mapping, transformation_ctx) -> DynamicFrame:
     for alias, frame in mapping.items():
         frame.toDF().createOrReplaceTempView(alias)
@@ -324,25 +648,10 @@ spark = glueContext.spark_session
 job = Job(glueContext)
 job.init(args["JOB_NAME"], args)
 
-# Script generated for node S3 - Sälka Designs Bucket
-S3SlkaDesignsBucket_node1746319528121 = glueContext.create_dynamic_frame.from_options(
-    format_options={"multiLine": "false"},
-    connection_type="s3",
-    format="json",
-    connection_options={"paths": ["s3://salka-designs/orders/raw/"], "recurse": True},
-    transformation_ctx="S3SlkaDesignsBucket_node1746319528121",
-)
-
-# Script generated for node RDS SQL Connector
-RDSSQLConnector_node1747868232157 = glueContext.create_dynamic_frame.from_options(
-    connection_type="postgresql",
-    connection_options={
-        "useConnectionProperties": "true",
-        "dbtable": "glue_connection_dummy",
-        "connectionName": "salka-glue-postgres-connection",
-    },
-    transformation_ctx="RDSSQLConnector_node1747868232157",
-)
+RAW_ORDERS_PATH = "s3://salka-designs/orders/raw/"
+
+# incremental: process new files in orders/raw/ (default); replay: reload archived orders by date
+RUN_MODE = GetOptionalJobArgs({"RUN_MODE": "incremental"})["RUN_MODE"]
 
 # Script generated for node Explode & Flatten JSON Data
 SqlQuery0 = """
@@ -384,80 +693,108 @@ FROM order_data
 LATERAL VIEW explode(result) exploded_orders AS order
 LATERAL VIEW explode(order.lineItems) exploded_items AS lineItem
 """
-ExplodeFlattenJSONData_node1748030681240 = sparkSqlQuery(
-    glueContext,
-    query=SqlQuery0,
-    mapping={"order_data": S3SlkaDesignsBucket_node1746319528121},
-    transformation_ctx="ExplodeFlattenJSONData_node1748030681240",
-)
-
-# Script generated for node Data Quality Checks
-DataQualityChecks_node1747796831025_ruleset = """
-    Rules = [
-      RowCount > 0,
-      Completeness "order_id" = 1.0,
-      Completeness "customer_email" = 1.0,
-      Completeness "product_quantity" = 1.0,
-      Completeness "product_price" = 1.0,
-      Completeness "order_total" = 1.0,
-      ColumnValues "product_quantity" > 0,
-      ColumnValues "product_price" >= 0
-    ]
-"""
 
-DataQualityChecks_node1747796831025 = EvaluateDataQuality().process_rows(
-    frame=ExplodeFlattenJSONData_node1748030681240,
-    ruleset=DataQualityChecks_node1747796831025_ruleset,
-    publishing_options={
-        "dataQualityEvaluationContext": "DataQualityChecks_node1747796831025",
-        "enableDataQualityCloudWatchMetrics": True,
-        "enableDataQualityResultsPublishing": True,
-    },
-    additional_options={
-        "observations.scope": "ALL",
-        "performanceTuning.caching": "CACHE_NOTHING",
-    },
-)
-
-assert (
-    DataQualityChecks_node1747796831025[
-        EvaluateDataQuality.DATA_QUALITY_RULE_OUTCOMES_KEY
-    ]
-    .filter(lambda x: x["Outcome"] == "Failed")
-    .count()
-    == 0
-), "The job failed due to failing DQ rules for node: ExplodeFlattenJSONData_node1748030681240"
-
-# Script generated for node originalData
-originalData_node1747797982691 = SelectFromCollection.apply(
-    dfc=DataQualityChecks_node1747796831025,
-    key="originalData",
-    transformation_ctx="originalData_node1747797982691",
-)
-
-# Script generated for node Drop Duplicates
-DropDuplicates_node1747798440191 = DynamicFrame.fromDF(
-    originalData_node1747797982691.toDF().dropDuplicates(),
-    glueContext,
-    "DropDuplicates_node1747798440191",
-)
+if RUN_MODE == "replay":
+    ReplayArchivedOrders(glueContext, SqlQuery0)
 
-# Script generated for node Save Orders to RDS
-SaveOrderstoRDS_node1746801798525 = SaveOrdersToRDSTransform(
-    glueContext,
-    DynamicFrameCollection(
-        {"DropDuplicates_node1747798440191": DropDuplicates_node1747798440191},
+else:
+    # Adaptive execution and shuffle partitions sized from the raw input
+    ConfigureSparkTuning(spark, GetJobTuning(), RAW_ORDERS_PATH)
+
+    # Script generated for node S3 - Sälka Designs Bucket
+    S3SlkaDesignsBucket_node1746319528121 = glueContext.create_dynamic_frame.from_options(
+        format_options={"multiLine": "false"},
+        connection_type="s3",
+        format="json",
+        connection_options={"paths": [RAW_ORDERS_PATH], "recurse": True},
+        transformation_ctx="S3SlkaDesignsBucket_node1746319528121",
+    )
+
+    # Script generated for node RDS SQL Connector
+    RDSSQLConnector_node1747868232157 = glueContext.create_dynamic_frame.from_options(
+        connection_type="postgresql",
+        connection_options={
+            "useConnectionProperties": "true",
+            "dbtable": "glue_connection_dummy",
+            "connectionName": "salka-glue-postgres-connection",
+        },
+        transformation_ctx="RDSSQLConnector_node1747868232157",
+    )
+
+    ExplodeFlattenJSONData_node1748030681240 = sparkSqlQuery(
         glueContext,
-    ),
-)
+        query=SqlQuery0,
+        mapping={"order_data": S3SlkaDesignsBucket_node1746319528121},
+        transformation_ctx="ExplodeFlattenJSONData_node1748030681240",
+    )
 
-# Script generated for node Move Processed JSON Files
-MoveProcessedJSONFiles_node1747698340978 = MoveProcessedFiles(
-    glueContext,
-    DynamicFrameCollection(
-        {"SaveOrderstoRDS_node1746801798525": SaveOrderstoRDS_node1746801798525},
+    # Script generated for node Data Quality Checks
+    DataQualityChecks_node1747796831025_ruleset = """
+        Rules = [
+          RowCount > 0,
+          Completeness "order_id" = 1.0,
+          Completeness "customer_email" = 1.0,
+          Completeness "product_quantity" = 1.0,
+          Completeness "product_price" = 1.0,
+          Completeness "order_total" = 1.0,
+          ColumnValues "product_quantity" > 0,
+          ColumnValues "product_price" >= 0
+        ]
+    """
+
+    DataQualityChecks_node1747796831025 = EvaluateDataQuality().process_rows(
+        frame=ExplodeFlattenJSONData_node1748030681240,
+        ruleset=DataQualityChecks_node1747796831025_ruleset,
+        publishing_options={
+            "dataQualityEvaluationContext": "DataQualityChecks_node1747796831025",
+            "enableDataQualityCloudWatchMetrics": True,
+            "enableDataQualityResultsPublishing": True,
+        },
+        additional_options={
+            "observations.scope": "ALL",
+            "performanceTuning.caching": "CACHE_NOTHING",
+        },
+    )
+
+    assert (
+        DataQualityChecks_node1747796831025[
+            EvaluateDataQuality.DATA_QUALITY_RULE_OUTCOMES_KEY
+        ]
+        .filter(lambda x: x["Outcome"] == "Failed")
+        .count()
+        == 0
+    ), "The job failed due to failing DQ rules for node: ExplodeFlattenJSONData_node1748030681240"
+
+    # Script generated for node originalData
+    originalData_node1747797982691 = SelectFromCollection.apply(
+        dfc=DataQualityChecks_node1747796831025,
+        key="originalData",
+        transformation_ctx="originalData_node1747797982691",
+    )
+
+    # Script generated for node Drop Duplicates
+    DropDuplicates_node1747798440191 = DynamicFrame.fromDF(
+        originalData_node1747797982691.toDF().dropDuplicates(),
+        glueContext,
+        "DropDuplicates_node1747798440191",
+    )
+
+    # Script generated for node Save Orders to RDS
+    SaveOrderstoRDS_node1746801798525 = SaveOrdersToRDSTransform(
         glueContext,
-    ),
-)
+        DynamicFrameCollection(
+            {"DropDuplicates_node1747798440191": DropDuplicates_node1747798440191},
+            glueContext,
+        ),
+    )
+
+    # Script generated for node Move Processed JSON Files
+    MoveProcessedJSONFiles_node1747698340978 = MoveProcessedFiles(
+        glueContext,
+        DynamicFrameCollection(
+            {"SaveOrderstoRDS_node1746801798525": SaveOrderstoRDS_node1746801798525},
+            glueContext,
+        ),
+    )
 
 job.commit()
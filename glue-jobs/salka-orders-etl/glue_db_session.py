@@ -0,0 +1,160 @@
+# Driver-side database session for the Glue job (attached with --extra-py-files)
+# - Small pool of JDBC connections opened through the Spark JVM (PostgreSQL driver is on the classpath)
+# - Control statements (stored procedures, lookups) run directly instead of as spark.read queries
+# - transaction() groups statements into one commit/rollback boundary
+
+import queue
+import threading
+from contextlib import contextmanager
+
+
+class GlueDatabaseSession:
+    def __init__(self, spark, jdbc_url, username, password, pool_size=2):
+        self._jvm = spark.sparkContext._gateway.jvm
+        self._jdbc_url = jdbc_url
+        self._username = username
+        self._password = password
+        self._pool_size = pool_size
+        self._pool = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _open_connection(self):
+        # Instantiate the driver directly: DriverManager can't see drivers loaded by Spark's classloader
+        properties = self._jvm.java.util.Properties()
+        properties.setProperty("user", self._username)
+        properties.setProperty("password", self._password)
+        return self._jvm.org.postgresql.Driver().connect(self._jdbc_url, properties)
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._opened < self._pool_size:
+                self._opened += 1
+                open_new = True
+            else:
+                open_new = False
+
+        if not open_new:
+            # Pool exhausted - wait for another thread to hand a connection back
+            return self._pool.get()
+
+        try:
+            return self._open_connection()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def _release(self, conn):
+        if conn.isClosed():
+            with self._lock:
+                self._opened -= 1
+        else:
+            self._pool.put(conn)
+
+    @contextmanager
+    def connection(self):
+        # Borrow a pooled connection (autocommit) for the duration of the block
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self):
+        # Borrow a connection and commit everything run on it in one transaction
+        with self.connection() as conn:
+            conn.setAutoCommit(False)
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.setAutoCommit(True)
+
+    def execute(self, sql, conn=None):
+        # Run a statement, returning the update count (autocommit unless conn is given)
+        if conn is not None:
+            return execute(conn, sql)
+        with self.connection() as pooled:
+            return execute(pooled, sql)
+
+    def query(self, sql, conn=None):
+        # Run a query, returning rows as dicts keyed by column label
+        if conn is not None:
+            return query(conn, sql)
+        with self.connection() as pooled:
+            return query(pooled, sql)
+
+    def query_scalar(self, sql, conn=None):
+        rows = self.query(sql, conn)
+        return next(iter(rows[0].values())) if rows else None
+
+    def sql_state(self, error):
+        # SQLSTATE of a failed statement (e.g. "40P01" for a deadlock), or None for other errors
+        # py4j proxies any method name, so check the class before calling getSQLState()
+        java_exception = getattr(error, "java_exception", None)
+        try:
+            sql_exception = self._jvm.java.lang.Class.forName("java.sql.SQLException")
+            while java_exception is not None:
+                if sql_exception.isInstance(java_exception):
+                    return java_exception.getSQLState()
+                java_exception = java_exception.getCause()
+        except Exception as e:
+            # Never let the lookup hide the error being classified
+            print(f"### Could not read SQLSTATE: {str(e)} ###")
+        return None
+
+    def validate(self):
+        # Open the first connection so bad or rotated credentials fail fast
+        return self.query_scalar("SELECT 1")
+
+    def close(self):
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+
+def execute(conn, sql):
+    statement = conn.createStatement()
+    try:
+        statement.execute(sql)
+        return statement.getUpdateCount()
+    finally:
+        statement.close()
+
+
+def query(conn, sql):
+    statement = conn.createStatement()
+    try:
+        result_set = statement.executeQuery(sql)
+        metadata = result_set.getMetaData()
+        columns = [
+            metadata.getColumnLabel(index)
+            for index in range(1, metadata.getColumnCount() + 1)
+        ]
+
+        rows = []
+        while result_set.next():
+            rows.append(
+                {
+                    column: result_set.getObject(index)
+                    for index, column in enumerate(columns, start=1)
+                }
+            )
+        return rows
+    finally:
+        statement.close()
@@ -0,0 +1,188 @@
+# Import-time and cold-start benchmark for the Sälka Lambda functions
+#
+# Each sample runs in a fresh Python interpreter, so every measurement is a cold import:
+#
+# - import_seconds: module load as the Lambda runtime does it during init
+# - deferred_import_seconds: heavy dependencies the handler imports on first use
+# - warm_up_seconds: the function's warm-up path - its warm_up() hook or a {"warmup": true}
+#   invocation (needs AWS credentials and VPC access, opt-in)
+#
+# The slowest top-level imports are read from `python -X importtime` to show which layers
+# dominate the init phase. A function whose module fails to import (e.g. boto3 missing locally)
+# is reported with the child's error and the remaining functions still run.
+#
+# Usage:
+#     python benchmarks/cold_start_benchmark.py [--runs 5] [--top 8] [--warm-up]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Shared modules (salka_secrets, ...) are provided to the functions by the salka-shared layer
+SHARED_DIR = os.path.join(os.path.dirname(os.path.dirname(FUNCTIONS_DIR)), "shared")
+
+# Lambda module -> dependencies imported lazily inside the handler, and its warm-up path:
+# "hook" calls warm_up(), "event" invokes lambda_handler({"warmup": True}), None has no warm-up
+FUNCTIONS = {
+    "getSalkaOrders": {"deferred": ["requests"], "warm_up": "hook"},
+    "generateSalkaReports": {
+        "deferred": ["pandas", "sqlalchemy", "pg8000", "xlsxwriter"],
+        "warm_up": "hook",
+    },
+    "sendWeeklyOrderReports": {"deferred": [], "warm_up": "event"},
+    "getSalkaReport": {"deferred": ["pg8000", "xlsxwriter"], "warm_up": "event"},
+    "processOrderMicroBatch": {"deferred": ["requests", "pg8000"], "warm_up": "event"},
+    "receiveSquarespaceWebhook": {"deferred": [], "warm_up": None},
+}
+
+CHILD_SCRIPT = """
+import importlib, json, sys, time
+sys.path[:0] = [{functions_dir!r}, {shared_dir!r}]
+
+result = {{}}
+start = time.perf_counter()
+module = importlib.import_module({module!r})
+result["import_seconds"] = time.perf_counter() - start
+
+start = time.perf_counter()
+try:
+    for dependency in {deferred!r}:
+        importlib.import_module(dependency)
+    result["deferred_import_seconds"] = time.perf_counter() - start
+except ImportError as e:
+    result["deferred_import_seconds"] = None
+    result["missing_dependency"] = str(e)
+
+if {warm_up!r}:
+    start = time.perf_counter()
+    if {warm_up!r} == "hook":
+        module.warm_up()
+    else:
+        module.lambda_handler({{"warmup": True}}, None)
+    result["warm_up_seconds"] = time.perf_counter() - start
+
+print(json.dumps(result))
+"""
+
+
+def child_env():
+    # boto3 clients are created at module load and need a region even without credentials
+    env = dict(os.environ)
+    env.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [SHARED_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+def _child_error(completed):
+    # Last line of the child's traceback (e.g. "ModuleNotFoundError: No module named 'boto3'")
+    lines = completed.stderr.strip().splitlines()
+    return lines[-1] if lines else f"exit status {completed.returncode}"
+
+
+def run_sample(module, deferred, warm_up):
+    # Returns the sample, or {"error": ...} when the child fails (import or warm-up error)
+    script = CHILD_SCRIPT.format(
+        functions_dir=FUNCTIONS_DIR,
+        shared_dir=SHARED_DIR,
+        module=module,
+        deferred=deferred,
+        warm_up=warm_up,
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        env=child_env(),
+    )
+    if completed.returncode != 0:
+        return {"error": _child_error(completed)}
+    # Module prints (e.g. "Starting Salka ...") come first, the JSON result is the last line
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module, top):
+    # Cumulative microseconds per top-level package from -X importtime (written to stderr)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=child_env(),
+        cwd=FUNCTIONS_DIR,
+    )
+    if completed.returncode != 0:
+        return []
+
+    cumulative = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        # Nested imports are indented past the single separator space; keep top-level packages
+        name = name[1:].rstrip()
+        if not name.startswith(" ") and "." not in name:
+            cumulative[name] = max(cumulative.get(name, 0), int(cumulative_us))
+
+    ranked = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)
+    return ranked[:top]
+
+
+def summarize(samples, key):
+    values = [sample[key] for sample in samples if sample.get(key) is not None]
+    if not values:
+        return "n/a"
+    return f"median {statistics.median(values) * 1000:.1f} ms (min {min(values) * 1000:.1f} ms)"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Import-time and cold-start benchmark for the Sälka Lambda functions"
+    )
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per function")
+    parser.add_argument("--top", type=int, default=8, help="slowest imports to list")
+    parser.add_argument(
+        "--warm-up", action="store_true", help="also time each warm_up() hook (hits AWS)"
+    )
+    args = parser.parse_args()
+
+    failed = []
+    for module, settings in FUNCTIONS.items():
+        warm_up = settings["warm_up"] if args.warm_up else None
+        print(f"\n=== {module} ===")
+
+        samples = []
+        for _ in range(args.runs):
+            sample = run_sample(module, settings["deferred"], warm_up)
+            if "error" in sample:
+                break
+            samples.append(sample)
+        if not samples:
+            print(f"error: {sample['error']}")
+            failed.append(module)
+            continue
+
+        print(f"import:          {summarize(samples, 'import_seconds')}")
+        print(f"deferred import: {summarize(samples, 'deferred_import_seconds')}")
+        if warm_up:
+            print(f"warm-up:         {summarize(samples, 'warm_up_seconds')}")
+        elif args.warm_up:
+            print("warm-up:         n/a (no warm-up path)")
+        if len(samples) < args.runs:
+            print(f"note: {len(samples)} of {args.runs} runs completed ({sample['error']})")
+        if samples[0].get("missing_dependency"):
+            print(f"note: {samples[0]['missing_dependency']}")
+
+        print("slowest imports at init:")
+        for name, cumulative_us in slowest_imports(module, args.top):
+            print(f"  {name:<24} {cumulative_us / 1000:8.1f} ms")
+
+    if failed:
+        print(f"\nFailed to benchmark: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,52 +1,170 @@
 import boto3
-import pandas as pd
-import json
 import os
+import time
 from datetime import datetime
-from sqlalchemy import create_engine, text
-from botocore.exceptions import ClientError
+
+# Shared modules, deployed with the salka-shared Lambda layer (see /shared)
+import salka_db_diagnostics
+import salka_reports
+import salka_secrets
+
+# pandas, SQLAlchemy and xlsxwriter are imported on first use (see warm_up) to keep cold starts short
 
 print("Starting Salka pending orders reports job")
 
+# Engine lifetime for warm invocations (seconds); secret caching is handled by salka_secrets
+ENGINE_TTL_SECONDS = int(os.environ.get("ENGINE_TTL_SECONDS", "1800"))
+
+# Capture DB performance (pg_stat_statements, table stats, query plans) around each report run
+DB_DIAGNOSTICS = os.environ.get("DB_DIAGNOSTICS", "true").lower() == "true"
+
+# Add timings to full-report query plans: EXPLAIN ANALYZE runs every report query a second time
+DB_EXPLAIN_ANALYZE = os.environ.get("DB_EXPLAIN_ANALYZE", "false").lower() == "true"
+
+# AWS clients are created once per execution environment and reused across invocations
+s3_client = boto3.client("s3")
+
+# Module-level engine cache: (value, created_at)
+_engine_cache = {"value": None, "created_at": 0.0}
 
-# Get database credentials
-def get_secret():
-    secret_name = "salka-rds-credentials"
-    region = "us-east-1"
-    client = boto3.client("secretsmanager", region_name=region)
-    try:
-        response = client.get_secret_value(SecretId=secret_name)
-        return json.loads(response["SecretString"])
-    except ClientError as e:
-        raise e
 
+# Connect to RDS (engine reused across warm invocations for ENGINE_TTL_SECONDS)
+def get_db_connection(force_refresh=False):
+    from sqlalchemy import create_engine, text
 
-# Connect to RDS
-def get_db_connection():
-    secret = get_secret()
-    conn_string = f"postgresql+pg8000://{secret['username']}:{secret['password']}@{secret['host']}:{secret['port']}/{secret['dbName']}"
-    engine = create_engine(conn_string)
+    engine_age = time.monotonic() - _engine_cache["created_at"]
+    if (
+        not force_refresh
+        and _engine_cache["value"] is not None
+        and engine_age < ENGINE_TTL_SECONDS
+    ):
+        return _engine_cache["value"]
 
+    if _engine_cache["value"] is not None:
+        _engine_cache["value"].dispose()
+
+    def connect(secret):
+        conn_string = f"postgresql+pg8000://{secret['username']}:{secret['password']}@{secret['host']}:{secret['port']}/{secret['dbName']}"
+        # Single pooled connection per Lambda container, checked before reuse
+        engine = create_engine(
+            conn_string, pool_size=1, max_overflow=0, pool_pre_ping=True
+        )
+        # Connect once so rotated credentials surface here and trigger a secret refresh
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return engine
+
+    if force_refresh:
+        salka_secrets.invalidate(salka_secrets.get_rds_secret_name())
+    engine = salka_secrets.call_with_secret_refresh(
+        salka_secrets.get_rds_secret_name(), connect
+    )
+
+    _engine_cache["value"] = engine
+    _engine_cache["created_at"] = time.monotonic()
     return engine
 
 
-def generate_df(sql_query, engine, result_name):
+# Import heavy dependencies and open the database connection ahead of the first real invocation
+def warm_up():
+    import pandas  # noqa: F401
+    import xlsxwriter  # noqa: F401
+
+    get_db_connection()
+    print("Warm-up complete")
+
+
+def generate_df(sql_query, engine, result_name, params=None):
+    import pandas as pd
+    from sqlalchemy import text
+
     try:
-        dataframe = pd.read_sql(text(sql_query), engine)
+        dataframe = pd.read_sql(text(sql_query), engine, params=params)
         print(f"Retrieved {len(dataframe)} rows from {result_name}")
         return dataframe
     except:
         print(f"Failed to generate dataframe for {result_name}")
 
 
+# Upper bound of the delta window: (time, snapshot xmin)
+# Every transaction below xmin has finished, so all status log rows with logged_xid < xmin are
+# visible to the queries that follow; rows from loads still in flight fall in the next window
+def get_report_window_end(engine):
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        row = conn.execute(
+            text(
+                "SELECT now(), pg_snapshot_xmin(pg_current_snapshot())::TEXT::BIGINT"
+            )
+        ).one()
+    return row[0], row[1]
+
+
+# Record the report run so the next delta report starts where this one ended
+def record_report_run(engine, report_mode, covered_until, covered_xid):
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO report_runs (report_mode, covered_until, covered_xid) "
+                "VALUES (:report_mode, :covered_until, :covered_xid)"
+            ),
+            {
+                "report_mode": report_mode,
+                "covered_until": covered_until,
+                "covered_xid": covered_xid,
+            },
+        )
+
+
+# DB diagnostics snapshot before the report queries (None when disabled or unavailable)
+def start_diagnostics(engine):
+    if not DB_DIAGNOSTICS:
+        return None
+    try:
+        return salka_db_diagnostics.snapshot(
+            salka_db_diagnostics.sqlalchemy_fetch(engine), "before"
+        )
+    except Exception as e:
+        print(f"DB diagnostics unavailable: {str(e)}")
+        return None
+
+
+# Compare with the previous run of the same mode and save the JSON artifact next to the reports
+# Query plans are captured on every run, with ANALYZE timings for full reports when
+# DB_EXPLAIN_ANALYZE is set; diagnostics never fail the run
+def finish_diagnostics(engine, report_mode, before, output_bucket):
+    if before is None:
+        return
+    try:
+        run_type = f"report_{report_mode}"
+        previous = salka_db_diagnostics.load_previous(
+            s3_client, output_bucket, "reports", run_type
+        )
+        diagnostics = salka_db_diagnostics.build_diagnostics(
+            salka_db_diagnostics.sqlalchemy_fetch(engine),
+            run_type,
+            before,
+            previous,
+            analyze=DB_EXPLAIN_ANALYZE and report_mode == "full",
+        )
+        salka_db_diagnostics.save_diagnostics(
+            s3_client, output_bucket, "reports", diagnostics
+        )
+    except Exception as e:
+        print(f"DB diagnostics failed: {str(e)}")
+
+
 # Generate and save reports
-def generate_reports():
+# report_mode "full" builds every sheet, "delta" only the status changes since the last run
+def generate_reports(report_mode="full"):
+    import pandas as pd
+
     # Connect to the database
     engine = get_db_connection()
 
-    # Set up S3 client
-    s3_client = boto3.client("s3")
-
     # Get today's date for folder structure
     now = datetime.now()
     formatted_date = now.strftime("%Y-%m-%d")
@@ -57,111 +175,82 @@ def generate_reports():
     output_bucket = os.environ.get("OUTPUT_BUCKET", "salka-reports")
 
     try:
-        print("Executing SQL queries...")
-
-        # Report 1: Pending Orders Summary
-        print("Generating pending orders report...")
-
-        pending_orders_query = """
-        SELECT product_sku, product_name, product_color, sum(product_quantity) AS quantity
-        FROM orders o
-        JOIN order_items oi
-        ON o.order_id = oi.order_id
-        WHERE lower(fulfillment_status) = 'pending'
-        GROUP BY product_sku, product_name, product_color, product_price
-        ORDER BY product_price DESC
-        """
-
-        pending_orders_df = generate_df(pending_orders_query, engine, "Pending  Orders")
-
-        # Report 2: Orders Schedule by Due Date
-        print("Generating order schedule report...")
-
-        schedule_query = """
-        SELECT DATE(created_on) as ordered_on, product_sku, product_name, 
-            product_color, sum(product_quantity) as quantity
-        FROM orders o
-        JOIN order_items oi
-        ON o.order_id = oi.order_id
-        GROUP BY ordered_on, product_sku, product_name, product_color, product_price
-        ORDER BY ordered_on, product_price DESC
-        """
-
-        schedule_df = generate_df(schedule_query, engine, "Order Schedule")
-
-        # Report 3: Cut List (joining with BOM)
-        print("Generating materials cut list...")
-        cut_list_query = """
-        SELECT 
-            bom.material_piece, bom.material_color, 
-            SUM(bom.material_quantity * oi.product_quantity) AS total_material_needed,
-            p.product_name, p.product_color, SUM(oi.product_quantity) AS total_products_ordered
-        FROM 
-            orders o
-        JOIN 
-            order_items oi ON o.order_id = oi.order_id
-        JOIN 
-            products p ON oi.product_sku = p.product_sku
-        JOIN 
-            bill_of_materials bom ON p.product_sku = bom.product_sku
-        WHERE 
-            lower(o.fulfillment_status) = 'pending'
-        GROUP BY 
-            bom.material_piece, bom.material_color,
-            p.product_name, p.product_color, p.product_sku
-        ORDER BY 
-            bom.material_piece, bom.material_color
-        """
-
-        cut_list_df = generate_df(cut_list_query, engine, "Cut List")
+        print(f"Executing SQL queries for {report_mode} report...")
+
+        diagnostics_before = start_diagnostics(engine)
+
+        # Each entry: (sheet name, dataframe, csv file prefix)
+        report_sheets = []
+        covered_until, covered_xid = get_report_window_end(engine)
+
+        if report_mode == "full":
+            # Reports 1-3: Pending Orders, Order Schedule and Cut List (queries in salka_reports)
+            # The report name doubles as the CSV file prefix
+            for report_name in ("pending_orders", "order_schedule", "cut_list"):
+                title = salka_reports.REPORTS[report_name]["title"]
+                print(f"Generating {title} report...")
+                report_query, report_params = salka_reports.build_report_query(report_name)
+                report_df = generate_df(report_query, engine, title, report_params)
+                report_sheets.append((title, report_df, report_name))
+
+            # Report 4: Monthly sales by region and product (from the precomputed sales_rollup)
+            print("Generating sales rollup report...")
+            sales_rollup_df = generate_df(
+                salka_reports.SALES_ROLLUP_QUERY, engine, "Sales Rollup"
+            )
+            report_sheets.append(("Sales by Region", sales_rollup_df, "sales_by_region"))
+
+        # Report 5: Status changes since the previous report run (from order_status_log)
+        print("Generating status changes delta report...")
+        delta_df = generate_df(
+            salka_reports.STATUS_CHANGES_QUERY,
+            engine,
+            "Status Changes",
+            {"covered_xid": covered_xid},
+        )
+        report_sheets.append(("Status Changes", delta_df, "status_changes"))
 
         # Create report folder path with date
         report_folder = f"reports/{year}/{month}/{day}"
 
         # Save to temporary location
         tmp_path = "/tmp"
-        pending_orders_path = f"{tmp_path}/pending_orders.csv"
-        schedule_path = f"{tmp_path}/order_schedule.csv"
-        cut_list_path = f"{tmp_path}/cut_list.csv"
-        excel_path = f"{tmp_path}/salka_order_reports.xlsx"
+        excel_prefix = (
+            "salka_order_reports" if report_mode == "full" else "salka_order_delta"
+        )
+        excel_path = f"{tmp_path}/{excel_prefix}.xlsx"
 
         # Save as CSV files
         print("Creating CSV files...")
-        pending_orders_df.to_csv(pending_orders_path, index=False)
-        schedule_df.to_csv(schedule_path, index=False)
-        cut_list_df.to_csv(cut_list_path, index=False)
+        for _, dataframe, csv_prefix in report_sheets:
+            dataframe.to_csv(f"{tmp_path}/{csv_prefix}.csv", index=False)
 
         # Create Excel with multiple sheets
         print("Creating Excel report with multiple sheets...")
         with pd.ExcelWriter(excel_path, engine="xlsxwriter") as writer:
-            pending_orders_df.to_excel(writer, sheet_name="Pending Orders", index=False)
-            schedule_df.to_excel(writer, sheet_name="Order Schedule", index=False)
-            cut_list_df.to_excel(writer, sheet_name="Materials Cut List", index=False)
+            for sheet_name, dataframe, _ in report_sheets:
+                dataframe.to_excel(writer, sheet_name=sheet_name, index=False)
 
         print(f"Uploading reports to S3 bucket: {output_bucket}/{report_folder}")
 
         # Upload to S3
-        s3_client.upload_file(
-            pending_orders_path,
-            output_bucket,
-            f"{report_folder}/pending_orders_{formatted_date}.csv",
-        )
-        s3_client.upload_file(
-            schedule_path,
-            output_bucket,
-            f"{report_folder}/order_schedule_{formatted_date}.csv",
-        )
-        s3_client.upload_file(
-            cut_list_path,
-            output_bucket,
-            f"{report_folder}/cut_list_{formatted_date}.csv",
-        )
+        for _, _, csv_prefix in report_sheets:
+            s3_client.upload_file(
+                f"{tmp_path}/{csv_prefix}.csv",
+                output_bucket,
+                f"{report_folder}/{csv_prefix}_{formatted_date}.csv",
+            )
         s3_client.upload_file(
             excel_path,
             output_bucket,
-            f"{report_folder}/salka_order_reports_{formatted_date}.xlsx",
+            f"{report_folder}/{excel_prefix}_{formatted_date}.xlsx",
         )
 
+        # Only advance the delta window once the reports are safely in S3
+        record_report_run(engine, report_mode, covered_until, covered_xid)
+
+        finish_diagnostics(engine, report_mode, diagnostics_before, output_bucket)
+
         print("All reports generated and saved to S3 successfully")
         return True
 
@@ -172,11 +261,38 @@ def generate_reports():
 
 # main lambda execution
 def lambda_handler(event, context):
+    # Scheduled warm-up ping: load dependencies and connections, skip report generation
+    if (event or {}).get("warmup"):
+        warm_up()
+        return {"statusCode": 200, "body": "Warm-up complete"}
+
     try:
-        # Generate reports
-        generate_reports()
+        # Report mode from the EventBridge rule input, falling back to the env default
+        report_mode = (event or {}).get("report_mode") or os.environ.get(
+            "REPORT_MODE", "full"
+        )
+        if report_mode not in ("full", "delta"):
+            raise ValueError(f"Unknown report_mode: {report_mode}")
+
+        # Generate reports, retrying once with fresh credentials if the secret was rotated
+        try:
+            generate_reports(report_mode)
+        except Exception as e:
+            if not salka_secrets.is_auth_failure(e):
+                raise
+            get_db_connection(force_refresh=True)
+            generate_reports(report_mode)
         return {"statusCode": 200, "body": "Salka reporting job completed successfully"}
 
     except Exception as e:
         print(f"Job failed: {str(e)}")
         return {"statusCode": 500, "body": f"Job failed: {str(e)}"}
+
+
+# Provisioned concurrency runs module init ahead of traffic, so warm up during init there
+# A failed warm-up must not fail init: the first invocation connects lazily instead
+if os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") == "provisioned-concurrency":
+    try:
+        warm_up()
+    except Exception as e:
+        print(f"Warm-up failed, connecting on first invocation: {str(e)}")
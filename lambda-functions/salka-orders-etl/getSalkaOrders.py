@@ -1,19 +1,35 @@
 import json
 import boto3
-import requests
 import os
 from datetime import datetime
 
-# S3 Client
+# Shared module, deployed with the salka-shared Lambda layer (see /shared)
+import salka_secrets
+
+# requests is imported on first use in get_squarespace_orders to keep cold starts short
+
+# AWS clients, created once per execution environment and reused across invocations
 s3_client = boto3.client('s3')
+glue_client = boto3.client('glue')
 
 # ENV
 SQUARESPACE_ORDER_ENDPOINT = os.environ.get('SQUARESPACE_ORDER_ENDPOINT')
 RAW_DATA_BUCKET = os.environ.get('RAW_DATA_BUCKET')
 SALKA_GLUE_JOB = os.environ.get('SALKA_GLUE_JOB')
-SQUARESPACE_SECRET_NAME = os.environ.get('SQUARESPACE_SECRET_NAME')
+
+def warm_up():
+    # Import requests and fetch the API key ahead of the first real invocation
+    import requests  # noqa: F401
+
+    get_squarespace_api_key()
+    print("Warm-up complete")
 
 def lambda_handler(event, context):
+    # Scheduled warm-up ping: load dependencies and secrets, skip extraction
+    if (event or {}).get('warmup'):
+        warm_up()
+        return {'statusCode': 200, 'body': json.dumps({'message': 'Warm-up complete'})}
+
     # Extract order data from Squarespace API and save to S3
     try:
         timestamp = datetime.now().strftime("%m%d%Y_%H%M%S")
@@ -50,31 +66,34 @@ def lambda_handler(event, context):
         }
     
 def get_squarespace_api_key():
+    # Cached by salka_secrets for SECRET_TTL_SECONDS across warm invocations
     try:
-        # Get API key from Secrets Manager
-        client = boto3.client('secretsmanager')
-        response = client.get_secret_value(SecretId=SQUARESPACE_SECRET_NAME)
-        secret = json.loads(response['SecretString'])
-
-        squarespace_api_key = secret['SQUARESPACE_API_KEY']
-
-        if squarespace_api_key:
-            return squarespace_api_key
-        else:
-            raise Exception("No API KEY returned from Secrets Manager")
+        return salka_secrets.get_squarespace_api_key()
 
     except Exception as e:
         print(f"Error retrieving Squarespace API Key: {str(e)}")
         raise Exception(f"Failed to get Squarespace API Key: {str(e)}")
 
 def get_squarespace_orders():
-    squarespace_api_key = get_squarespace_api_key()
-    headers = {
-        'Authorization': f'Bearer {squarespace_api_key}',
-        'Content-Type': 'application/json'
-    }
-    
-    response = requests.get(SQUARESPACE_ORDER_ENDPOINT, headers=headers)
+    import requests
+
+    def fetch_orders(secret):
+        headers = {
+            'Authorization': f"Bearer {secret['SQUARESPACE_API_KEY']}",
+            'Content-Type': 'application/json'
+        }
+        response = requests.get(SQUARESPACE_ORDER_ENDPOINT, headers=headers)
+
+        # 401/403 means the cached key is stale (rotated) - salka_secrets refreshes and retries
+        if response.status_code in (401, 403):
+            raise PermissionError(f"Squarespace rejected API key: {response.status_code}")
+        return response
+
+    # Make sure the key exists before calling the API
+    get_squarespace_api_key()
+    response = salka_secrets.call_with_secret_refresh(
+        salka_secrets.get_squarespace_secret_name(), fetch_orders
+    )
 
     # Return the raw JSON response
     if response.status_code == 200:
@@ -101,7 +120,6 @@ def save_json_to_s3(json_data, bucket, key):
 
 def run_glue_job():
     try:
-        glue_client = boto3.client('glue')
         response = glue_client.start_job_run(JobName=SALKA_GLUE_JOB)
 
         print(f"Started Glue job with ID: {response['JobRunId']}")
@@ -109,4 +127,12 @@ def run_glue_job():
     
     except Exception as e:
         print(f"Error running the glue job: {str(e)}")
-        raise Exception(f"Failed to run glue job to process order data: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Failed to run glue job to process order data: {str(e)}")
+
+# Provisioned concurrency runs module init ahead of traffic, so warm up during init there
+# A failed warm-up must not fail init: the first invocation fetches the secret lazily instead
+if os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE') == 'provisioned-concurrency':
+    try:
+        warm_up()
+    except Exception as e:
+        print(f'Warm-up failed, initializing on first invocation: {str(e)}')
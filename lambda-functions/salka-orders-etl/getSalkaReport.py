@@ -0,0 +1,165 @@
+import base64
+import csv
+import io
+import json
+import os
+import time
+from datetime import date
+from decimal import Decimal
+
+# Shared modules, deployed with the salka-shared Lambda layer (see /shared)
+import salka_db_connection
+import salka_reports
+
+# pg8000 and xlsxwriter are imported on first use to keep cold starts short
+
+# ENV
+REPORT_CACHE_MAX_BYTES = int(os.environ.get("REPORT_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+DATA_VERSION_CHECK_SECONDS = int(os.environ.get("DATA_VERSION_CHECK_SECONDS", "30"))
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Rendered reports, shared by every request served by this execution environment
+report_cache = salka_reports.ReportCache(max_bytes=REPORT_CACHE_MAX_BYTES)
+
+# Module-level cache: (value, checked_at)
+_data_version_cache = {"value": None, "checked_at": 0.0}
+
+
+def lambda_handler(event, context):
+    # On-demand reports (Lambda function URL / API Gateway GET):
+    #   ?report=pending_orders|order_schedule|cut_list
+    #   &start_date=YYYY-MM-DD&end_date=YYYY-MM-DD&status=pending|fulfilled|all&format=json|csv|xlsx
+
+    # Scheduled warm-up ping: open the database connection, skip processing
+    if (event or {}).get("warmup"):
+        salka_db_connection.get_connection()
+        return {"statusCode": 200, "body": "Warm-up complete"}
+
+    try:
+        params = (event or {}).get("queryStringParameters") or {}
+        report_name = params.get("report", "pending_orders")
+        output_format = params.get("format", "json").lower()
+        if output_format not in CONTENT_TYPES:
+            raise ValueError(f"Unknown format: {output_format} (expected json, csv or xlsx)")
+
+        report_query, report_params = salka_reports.build_report_query(
+            report_name,
+            start_date=params.get("start_date"),
+            end_date=params.get("end_date"),
+            status=params.get("status"),
+        )
+
+        cache_key = (
+            report_name,
+            params.get("start_date"),
+            params.get("end_date"),
+            (params.get("status") or "").lower(),
+            output_format,
+        )
+
+        # A cache hit within DATA_VERSION_CHECK_SECONDS is served without touching RDS
+        data_version = get_data_version()
+
+        cached = report_cache.get(cache_key, data_version)
+        cache_status = "HIT" if cached else "MISS"
+        if cached:
+            body, content_type = cached
+        else:
+            conn = salka_db_connection.get_live_connection()
+            columns, rows = run_report(conn, report_query, report_params)
+            body = render(report_name, columns, rows, output_format)
+            content_type = CONTENT_TYPES[output_format]
+            report_cache.put(cache_key, body, content_type, data_version)
+
+        print(f"Served {report_name} ({output_format}) cache {cache_status}: {report_cache.stats()}")
+        return build_response(report_name, body, content_type, output_format, cache_status, data_version)
+
+    except ValueError as e:
+        print(f"Invalid report request: {str(e)}")
+        return {"statusCode": 400, "body": json.dumps({"error": str(e)})}
+
+    except Exception as e:
+        print(f"Error generating report: {str(e)}")
+        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+
+
+def get_data_version():
+    # ETL data version, re-read at most every DATA_VERSION_CHECK_SECONDS (the only time a cached
+    # report needs the database). A new version (ETL commit or SKU migration) clears the report
+    # cache on the next lookup
+    check_age = time.monotonic() - _data_version_cache["checked_at"]
+    if _data_version_cache["value"] is None or check_age >= DATA_VERSION_CHECK_SECONDS:
+        conn = salka_db_connection.get_live_connection()
+        _data_version_cache["value"] = conn.run(salka_reports.DATA_VERSION_QUERY)[0][0]
+        _data_version_cache["checked_at"] = time.monotonic()
+    return _data_version_cache["value"]
+
+
+def run_report(conn, report_query, report_params):
+    rows = conn.run(report_query, **report_params)
+    columns = [column["name"] for column in conn.columns]
+    return columns, rows
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def render(report_name, columns, rows, output_format):
+    # Returns the report body as bytes
+    if output_format == "json":
+        records = [
+            {column: _json_value(value) for column, value in zip(columns, row)}
+            for row in rows
+        ]
+        return json.dumps({"report": report_name, "rows": records}).encode("utf-8")
+
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        writer.writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+    import xlsxwriter
+
+    buffer = io.BytesIO()
+    workbook = xlsxwriter.Workbook(buffer, {"in_memory": True})
+    worksheet = workbook.add_worksheet(salka_reports.REPORTS[report_name]["title"])
+    worksheet.write_row(0, 0, columns)
+    for row_number, row in enumerate(rows, start=1):
+        worksheet.write_row(row_number, 0, [_json_value(value) for value in row])
+    workbook.close()
+    return buffer.getvalue()
+
+
+def build_response(report_name, body, content_type, output_format, cache_status, data_version):
+    headers = {
+        "Content-Type": content_type,
+        "X-Cache": cache_status,
+        "X-Data-Version": str(data_version),
+    }
+    if output_format == "json":
+        return {"statusCode": 200, "headers": headers, "body": body.decode("utf-8")}
+
+    filename = f"{report_name}_{date.today().isoformat()}.{output_format}"
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    if output_format == "csv":
+        return {"statusCode": 200, "headers": headers, "body": body.decode("utf-8")}
+
+    # Binary bodies go through the function URL / API Gateway base64-encoded
+    return {
+        "statusCode": 200,
+        "headers": headers,
+        "body": base64.b64encode(body).decode("ascii"),
+        "isBase64Encoded": True,
+    }
@@ -0,0 +1,197 @@
+import io
+import json
+import os
+from datetime import datetime
+
+import boto3
+
+# Shared modules, deployed with the salka-shared Lambda layer (see /shared)
+import salka_db_connection
+import salka_secrets
+import salka_orders
+import salka_reports
+from salka_orders import ORDER_COLUMNS, ORDER_ITEM_COLUMNS, flatten_order, latest_orders
+from salka_order_queue import MicroBatcher
+
+# requests and pg8000 are imported on first use to keep cold starts short
+
+# AWS clients, created once per execution environment and reused across invocations
+s3_client = boto3.client("s3")
+
+# ENV
+SQUARESPACE_ORDER_ENDPOINT = os.environ.get("SQUARESPACE_ORDER_ENDPOINT")
+ARCHIVE_BUCKET = os.environ.get("ARCHIVE_BUCKET", "salka-designs")
+PROCESSED_ORDER_FOLDER = os.environ.get("PROCESSED_ORDER_FOLDER", "orders/processed/")
+
+# Same staging tables (and so the same advisory lock) as the Glue job's STAGING_* parameters
+STAGING_ORDERS_TABLE = os.environ.get(
+    "STAGING_ORDERS_TABLE", salka_orders.STAGING_ORDERS_TABLE
+)
+STAGING_ORDER_ITEMS_TABLE = os.environ.get(
+    "STAGING_ORDER_ITEMS_TABLE", salka_orders.STAGING_ORDER_ITEMS_TABLE
+)
+
+
+def lambda_handler(event, context):
+    # Loads one micro-batch of queued Squarespace order notifications into RDS.
+    # Triggered by the SQS event source mapping: BatchSize and MaximumBatchingWindowInSeconds
+    # bound each micro-batch by size and time.
+
+    # Scheduled warm-up ping: open the database connection, skip processing
+    if (event or {}).get("warmup"):
+        salka_db_connection.get_connection()
+        return {"statusCode": 200, "body": "Warm-up complete"}
+
+    messages = [
+        (record["messageId"], json.loads(record["body"]))
+        for record in event.get("Records", [])
+    ]
+    print(f"Processing micro-batch of {len(messages)} order notifications")
+
+    failed_message_ids = process_messages(messages)
+
+    # Partial batch response: only failed messages return to the queue for retry
+    return {
+        "batchItemFailures": [
+            {"itemIdentifier": message_id} for message_id in failed_message_ids
+        ]
+    }
+
+
+def process_queue(order_queue, max_batch_size=50, max_wait_seconds=60):
+    # Polling mode for local runs and tests: drain one size/time bounded batch from any queue
+    batch = MicroBatcher(order_queue, max_batch_size, max_wait_seconds).next_batch()
+    failed = set(process_messages(batch))
+
+    order_queue.delete(receipt for receipt, _ in batch if receipt not in failed)
+    if failed and hasattr(order_queue, "release"):
+        order_queue.release(failed)
+
+    return len(batch) - len(failed)
+
+
+def process_messages(messages):
+    # messages: [(message_id, notification)]; returns the message ids that failed
+    message_ids_by_order = {}
+    for message_id, notification in messages:
+        message_ids_by_order.setdefault(notification["order_id"], []).append(message_id)
+
+    # Several notifications for one order (create + updates) need only one fetch
+    orders = []
+    failed_message_ids = []
+    for order_id, message_ids in message_ids_by_order.items():
+        try:
+            orders.append(fetch_order(order_id))
+        except Exception as e:
+            print(f"Failed to fetch order {order_id}: {str(e)}")
+            failed_message_ids.extend(message_ids)
+
+    orders = latest_orders(orders)
+    if orders:
+        # A failed load raises, so the whole batch is retried by SQS
+        archive_orders(orders)
+        load_orders(orders)
+
+    return failed_message_ids
+
+
+def fetch_order(order_id):
+    import requests
+
+    def request_order(secret):
+        headers = {
+            "Authorization": f"Bearer {secret['SQUARESPACE_API_KEY']}",
+            "Content-Type": "application/json",
+        }
+        response = requests.get(
+            f"{SQUARESPACE_ORDER_ENDPOINT.rstrip('/')}/{order_id}", headers=headers
+        )
+
+        # 401/403 means the cached key is stale (rotated) - salka_secrets refreshes and retries
+        if response.status_code in (401, 403):
+            raise PermissionError(f"Squarespace rejected API key: {response.status_code}")
+        return response
+
+    response = salka_secrets.call_with_secret_refresh(
+        salka_secrets.get_squarespace_secret_name(), request_order
+    )
+
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(f"Failed to fetch order: {response.status_code}, {response.text}")
+
+
+def archive_orders(orders):
+    # Same shape and prefix as the weekly files archived by the Glue job, so history stays complete
+    now = datetime.now()
+    key = (
+        f"{PROCESSED_ORDER_FOLDER}{now.strftime('%Y/%m/%d')}/"
+        f"squarespace_webhook_orders_{now.strftime('%m%d%Y_%H%M%S_%f')}.json"
+    )
+    s3_client.put_object(
+        Bucket=ARCHIVE_BUCKET,
+        Key=key,
+        Body=json.dumps({"result": orders}),
+        ContentType="application/json",
+    )
+    print(f"Archived {len(orders)} orders to s3://{ARCHIVE_BUCKET}/{key}")
+
+
+def copy_rows(conn, table, columns, rows):
+    # COPY the rows into a staging table in one round-trip (NULL and "" stay distinct)
+    buffer = io.StringIO(salka_orders.copy_csv(rows, columns))
+
+    conn.run(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        stream=buffer,
+    )
+
+
+def load_orders(orders):
+    # Stage the micro-batch and apply it with the same procedures as the weekly Glue job
+    order_rows = []
+    item_rows = []
+    for order in orders:
+        order_row, order_item_rows = flatten_order(order)
+        # The Glue flatten explodes line items, so orders without items never reach staging
+        if order_item_rows:
+            order_rows.append(order_row)
+            item_rows.extend(order_item_rows)
+
+    if not order_rows:
+        print("No orders with line items in micro-batch")
+        return 0, 0
+
+    conn = salka_db_connection.get_live_connection()
+    conn.run("BEGIN")
+    try:
+        conn.run(salka_orders.staging_lock_sql(STAGING_ORDERS_TABLE))
+        conn.run(f"TRUNCATE {STAGING_ORDERS_TABLE}, {STAGING_ORDER_ITEMS_TABLE}")
+
+        copy_rows(conn, STAGING_ORDERS_TABLE, ORDER_COLUMNS, order_rows)
+        copy_rows(conn, STAGING_ORDER_ITEMS_TABLE, ORDER_ITEM_COLUMNS, item_rows)
+
+        rows_modified = conn.run(
+            "SELECT upsert_orders_from_staging(:staging_table)",
+            staging_table=STAGING_ORDERS_TABLE,
+        )[0][0]
+        items_inserted = conn.run(
+            "SELECT insert_order_items_from_staging(:staging_table)",
+            staging_table=STAGING_ORDER_ITEMS_TABLE,
+        )[0][0]
+        conn.run(
+            f"SELECT refresh_sales_rollup(ARRAY(SELECT order_id FROM {STAGING_ORDERS_TABLE}))"
+        )
+        # New data version for cached reports - last, so the row lock is brief
+        if rows_modified or items_inserted:
+            conn.run(salka_reports.BUMP_DATA_VERSION_SQL)
+        conn.run("COMMIT")
+
+    except Exception as e:
+        conn.run("ROLLBACK")
+        print(f"Error loading micro-batch: {str(e)}")
+        raise
+
+    print(f"Upserted {rows_modified} orders, inserted {items_inserted} order items")
+    return rows_modified, items_inserted
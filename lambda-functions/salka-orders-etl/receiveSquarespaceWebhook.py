@@ -0,0 +1,87 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+from datetime import datetime
+
+# Shared modules, deployed with the salka-shared Lambda layer (see /shared)
+import salka_secrets
+from salka_order_queue import SqsOrderQueue
+
+# ENV
+ORDER_QUEUE_URL = os.environ.get("ORDER_QUEUE_URL")
+WEBHOOK_SECRET_NAME = os.environ.get("WEBHOOK_SECRET_NAME")
+
+# Only order notifications are queued; other topics are acknowledged and dropped
+ORDER_TOPICS = ("order.create", "order.update")
+
+# Queue client, created once per execution environment (tests can replace it with LocalOrderQueue)
+order_queue = SqsOrderQueue(ORDER_QUEUE_URL) if ORDER_QUEUE_URL else None
+
+
+def lambda_handler(event, context):
+    # Receives Squarespace order webhooks (Lambda function URL) and queues them for micro-batching.
+    # Responds quickly: the order itself is fetched and loaded by processOrderMicroBatch.
+    try:
+        body = get_raw_body(event)
+        headers = {key.lower(): value for key, value in (event.get("headers") or {}).items()}
+
+        verify_signature(body, headers.get("squarespace-signature"))
+
+        notification = json.loads(body)
+        topic = notification.get("topic")
+
+        if topic not in ORDER_TOPICS:
+            print(f"Ignoring webhook topic: {topic}")
+            return {"statusCode": 200, "body": json.dumps({"message": "Ignored"})}
+
+        message = {
+            "order_id": notification["data"]["orderId"],
+            "topic": topic,
+            "notification_id": notification.get("id"),
+            "received_at": datetime.utcnow().isoformat(),
+        }
+        order_queue.send(message)
+
+        print(f"Queued {topic} for order {message['order_id']}")
+        return {"statusCode": 200, "body": json.dumps({"message": "Queued"})}
+
+    except PermissionError as e:
+        print(f"Rejected webhook: {str(e)}")
+        return {"statusCode": 401, "body": json.dumps({"error": "Invalid signature"})}
+
+    except (KeyError, ValueError) as e:
+        print(f"Invalid webhook payload: {str(e)}")
+        return {"statusCode": 400, "body": json.dumps({"error": "Invalid payload"})}
+
+    except Exception as e:
+        # 5xx makes Squarespace retry the notification
+        print(f"Error queueing webhook: {str(e)}")
+        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+
+
+def get_raw_body(event):
+    # Signature is computed over the exact request bytes, so decode but don't re-serialize
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded"):
+        return base64.b64decode(body)
+    return body.encode("utf-8")
+
+
+def verify_signature(body, signature):
+    # Squarespace signs the body with HMAC-SHA256 using the hex-encoded subscription secret
+    if not WEBHOOK_SECRET_NAME:
+        raise Exception("Missing required env variable: WEBHOOK_SECRET_NAME")
+    if not signature:
+        raise PermissionError("Missing Squarespace-Signature header")
+
+    def check(secret):
+        expected = hmac.new(
+            bytes.fromhex(secret["SQUARESPACE_WEBHOOK_SECRET"]), body, hashlib.sha256
+        ).hexdigest()
+        if not hmac.compare_digest(expected, signature):
+            raise PermissionError("Signature mismatch")
+
+    # A mismatch refetches the secret once, in case the subscription secret was rotated
+    salka_secrets.call_with_secret_refresh(WEBHOOK_SECRET_NAME, check)
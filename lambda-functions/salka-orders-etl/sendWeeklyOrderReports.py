@@ -6,11 +6,20 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from botocore.exceptions import ClientError
 
+# AWS clients, created once per execution environment and reused across invocations
+# SES uses the default AWS region from the Lambda environment
+s3_client = boto3.client("s3")
+ses_client = boto3.client("ses")
+
 
 def lambda_handler(event, context):
     # Lambda function to send an email with a presigned URL to an Excel report.
     # Triggered by S3 event when a new Excel file is uploaded to the reports folder.
 
+    # Scheduled warm-up ping: clients are already created at module load
+    if (event or {}).get("warmup"):
+        return {"statusCode": 200, "body": "Warm-up complete"}
+
     print("Email notification Lambda triggered")
 
     try:
@@ -70,7 +79,6 @@ def extract_s3_info(event):
 
 def generate_presigned_url(bucket, key, expiration=259200):
     # Generate a presigned URL for an S3 object
-    s3_client = boto3.client("s3")
     try:
         url = s3_client.generate_presigned_url(
             "get_object",
@@ -172,9 +180,7 @@ def send_report_email(file_url, file_key, sender_email, recipient_emails):
     # Attach the HTML body
     msg.attach(MIMEText(body, "html"))
 
-    # Create SES client and send (using default AWS region from Lambda environment)
-    ses_client = boto3.client("ses")
-
+    # Send with the module-level SES client
     try:
         response = ses_client.send_raw_email(
             Source=sender_email,
@@ -0,0 +1,70 @@
+# Cached pg8000 connection for the Lambda functions (processOrderMicroBatch, getSalkaReport)
+# - get_connection(): one connection per execution environment, reused for CONNECTION_TTL_SECONDS
+# - get_live_connection(): the cached connection checked with SELECT 1, reopened once if dropped
+# Credentials come from salka_secrets, refetched once when a rotation makes them stale
+
+import os
+import time
+
+import salka_secrets
+
+# pg8000 is imported on first use to keep cold starts short
+
+CONNECTION_TTL_SECONDS = int(os.environ.get("CONNECTION_TTL_SECONDS", "1800"))
+
+# Module-level connection cache: (value, created_at)
+_connection_cache = {"value": None, "created_at": 0.0}
+
+
+def _connect(secret):
+    import pg8000.native
+
+    conn = pg8000.native.Connection(
+        user=secret["username"],
+        password=secret["password"],
+        host=secret["host"],
+        port=int(secret["port"]),
+        database=secret["dbName"],
+    )
+    conn.run("SELECT 1")
+    return conn
+
+
+def get_connection(force_refresh=False):
+    # pg8000 connection reused across warm invocations for CONNECTION_TTL_SECONDS
+    connection_age = time.monotonic() - _connection_cache["created_at"]
+    if (
+        not force_refresh
+        and _connection_cache["value"] is not None
+        and connection_age < CONNECTION_TTL_SECONDS
+    ):
+        return _connection_cache["value"]
+
+    close_connection()
+    conn = salka_secrets.call_with_secret_refresh(
+        salka_secrets.get_rds_secret_name(), _connect
+    )
+    _connection_cache["value"] = conn
+    _connection_cache["created_at"] = time.monotonic()
+    return conn
+
+
+def get_live_connection():
+    try:
+        conn = get_connection()
+        conn.run("SELECT 1")
+        return conn
+    except Exception:
+        # Cached connection was dropped (idle timeout, RDS restart) - reconnect once
+        return get_connection(force_refresh=True)
+
+
+def close_connection():
+    conn = _connection_cache["value"]
+    _connection_cache["value"] = None
+    _connection_cache["created_at"] = 0.0
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
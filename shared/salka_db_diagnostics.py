@@ -0,0 +1,367 @@
+# Database performance capture for the Glue job and report runs
+# - snapshot(): pg_stat_statements, table/index usage and dead-tuple (bloat) stats at a point in time
+# - explain_known_queries(): EXPLAIN plans for the pipeline's read-only queries; ANALYZE/BUFFERS
+#   (runs each query again) only when callers enable it with DB_EXPLAIN_ANALYZE
+# - build_diagnostics(): before/after deltas plus regressions against the previous run's artifact
+# - save_diagnostics(): JSON artifact stored next to the reports in S3
+#
+# Every function takes a fetch(sql) callable returning rows as dicts, so the same code runs on the
+# Glue JDBC session (GlueDatabaseSession.query), a SQLAlchemy engine or a pg8000 connection.
+# Statements executed inside upsert_orders_from_staging() are only captured by pg_stat_statements
+# with pg_stat_statements.track = all (RDS parameter group).
+
+import json
+from datetime import date, datetime
+
+import salka_reports
+
+# Regression thresholds
+LATENCY_RATIO = 2.0  # flagged when a query is this many times slower than the previous run...
+LATENCY_MIN_INCREASE_MS = 50.0  # ...and at least this much slower in absolute terms
+SEQ_SCAN_MIN_ROWS = 10000  # sequential scans on smaller relations are expected, not regressions
+DEAD_TUPLE_RATIO = 0.2  # tables with more dead tuples than this need (auto)vacuum attention
+STATEMENT_LIMIT = 50  # statements kept in the artifact, by time spent during the run
+
+# Every statement, not a top N: the "before" counters must cover whatever the run executes, or a
+# statement outside the top N would be diffed against zero and report its all-time totals
+STATEMENTS_SQL = """
+    SELECT queryid::TEXT AS queryid, left(query, 500) AS query, calls,
+        total_exec_time, mean_exec_time, rows, shared_blks_hit, shared_blks_read
+    FROM pg_stat_statements
+    WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+    ORDER BY total_exec_time DESC
+    """
+
+TABLES_SQL = """
+    SELECT relname, seq_scan, seq_tup_read, COALESCE(idx_scan, 0) AS idx_scan,
+        n_live_tup, n_dead_tup, n_tup_ins, n_tup_upd, n_tup_del,
+        pg_total_relation_size(relid) AS total_bytes,
+        last_autovacuum::TEXT AS last_autovacuum, last_autoanalyze::TEXT AS last_autoanalyze
+    FROM pg_stat_user_tables
+    ORDER BY relname
+    """
+
+INDEXES_SQL = """
+    SELECT relname, indexrelname, idx_scan, idx_tup_read,
+        pg_relation_size(indexrelid) AS index_bytes
+    FROM pg_stat_user_indexes
+    ORDER BY relname, indexrelname
+    """
+
+
+def known_queries():
+    # Read-only pipeline queries that are safe to run under EXPLAIN ANALYZE
+    queries = {
+        report_name: salka_reports.build_report_query(report_name)
+        for report_name in salka_reports.REPORTS
+    }
+    queries["sales_rollup"] = (salka_reports.SALES_ROLLUP_QUERY, {})
+    queries["status_changes"] = (
+        salka_reports.STATUS_CHANGES_QUERY.replace(
+            ":covered_xid", "pg_snapshot_xmin(pg_current_snapshot())::TEXT::BIGINT"
+        ),
+        {},
+    )
+    return queries
+
+
+def sqlalchemy_fetch(engine):
+    from sqlalchemy import text
+
+    def fetch(sql):
+        with engine.connect() as conn:
+            return [dict(row) for row in conn.execute(text(sql)).mappings()]
+
+    return fetch
+
+
+def pg8000_fetch(conn):
+    def fetch(sql):
+        rows = conn.run(sql)
+        columns = [column["name"] for column in conn.columns]
+        return [dict(zip(columns, row)) for row in rows]
+
+    return fetch
+
+
+def _safe_fetch(fetch, sql):
+    # Missing extensions or permissions shouldn't fail the job being diagnosed
+    try:
+        return fetch(sql)
+    except Exception as e:
+        print(f"Diagnostics query failed: {str(e)}")
+        return {"unavailable": str(e)}
+
+
+def snapshot(fetch, label):
+    return {
+        "label": label,
+        "captured_at": datetime.utcnow().isoformat(),
+        "statements": _safe_fetch(fetch, STATEMENTS_SQL),
+        "tables": _safe_fetch(fetch, TABLES_SQL),
+        "indexes": _safe_fetch(fetch, INDEXES_SQL),
+    }
+
+
+def _inline_params(sql, params):
+    # EXPLAIN can't take bind parameters: inline the (internal, non user supplied) values
+    for name, value in sorted(params.items(), key=lambda item: -len(item[0])):
+        if isinstance(value, date):
+            literal = f"DATE '{value.isoformat()}'"
+        elif isinstance(value, (int, float)):
+            literal = str(value)
+        else:
+            literal = "'" + str(value).replace("'", "''") + "'"
+        sql = sql.replace(f":{name}", literal)
+    return sql
+
+
+def _parse_plan(value):
+    # pg8000/SQLAlchemy return the JSON plan parsed; JDBC returns a PGobject/string
+    if isinstance(value, (list, dict)):
+        return value
+    return json.loads(str(value))
+
+
+def _walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def _scanned_rows(node):
+    # Rows a Seq Scan read: actual rows (ANALYZE) or, for a plain EXPLAIN, the planner's estimate
+    if "Actual Rows" in node:
+        return node["Actual Rows"] + node.get("Rows Removed by Filter", 0)
+    return node.get("Plan Rows", 0)
+
+
+def summarize_plan(plan):
+    # execution_ms and block counts are None for a plain EXPLAIN
+    root = plan[0] if isinstance(plan, list) else plan
+    nodes = list(_walk(root["Plan"]))
+    return {
+        "execution_ms": root.get("Execution Time"),
+        "planning_ms": root.get("Planning Time"),
+        "total_cost": root["Plan"].get("Total Cost"),
+        "node_types": sorted({node["Node Type"] for node in nodes}),
+        "seq_scans": sorted(
+            {
+                node["Relation Name"]
+                for node in nodes
+                if node["Node Type"] == "Seq Scan" and _scanned_rows(node) >= SEQ_SCAN_MIN_ROWS
+            }
+        ),
+        "shared_hit_blocks": root["Plan"].get("Shared Hit Blocks"),
+        "shared_read_blocks": root["Plan"].get("Shared Read Blocks"),
+    }
+
+
+def explain_known_queries(fetch, queries=None, analyze=False):
+    # Plain EXPLAIN only plans the query (plan shape, Seq Scan nodes, cost); EXPLAIN ANALYZE also
+    # executes it, so only read-only queries belong here
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    plans = {}
+    for name, (sql, params) in (queries or known_queries()).items():
+        explain_sql = f"EXPLAIN ({options}) {_inline_params(sql, params)}"
+        try:
+            rows = fetch(explain_sql)
+            plan = _parse_plan(next(iter(rows[0].values())))
+            plans[name] = {"summary": summarize_plan(plan), "plan": plan}
+        except Exception as e:
+            print(f"Failed to explain {name}: {str(e)}")
+            plans[name] = {"error": str(e)}
+    return plans
+
+
+def _by_key(rows, key):
+    return {row[key]: row for row in rows} if isinstance(rows, list) else {}
+
+
+def diff_snapshots(before, after):
+    # Activity between the two snapshots: statement time per call, table scans and churn
+    # A statement missing from the complete "before" snapshot first ran during the run, so its
+    # counters start at zero; without a "before" statement snapshot there is nothing to diff
+    statements = []
+    has_baseline = isinstance(before["statements"], list)
+    before_statements = _by_key(before["statements"], "queryid")
+    after_statements = after["statements"] if isinstance(after["statements"], list) else []
+    for row in after_statements if has_baseline else []:
+        previous = before_statements.get(row["queryid"], {})
+        calls = row["calls"] - previous.get("calls", 0)
+        if calls <= 0:
+            continue
+        total_ms = float(row["total_exec_time"]) - float(previous.get("total_exec_time", 0))
+        statements.append(
+            {
+                "queryid": row["queryid"],
+                "query": row["query"],
+                "calls": calls,
+                "total_ms": round(total_ms, 2),
+                "mean_ms": round(total_ms / calls, 2),
+                "shared_blks_read": row["shared_blks_read"] - previous.get("shared_blks_read", 0),
+            }
+        )
+
+    tables = []
+    before_tables = _by_key(before["tables"], "relname")
+    for row in after["tables"] if isinstance(after["tables"], list) else []:
+        previous = before_tables.get(row["relname"], {})
+        live, dead = row["n_live_tup"], row["n_dead_tup"]
+        tables.append(
+            {
+                "relname": row["relname"],
+                "seq_scans": row["seq_scan"] - previous.get("seq_scan", 0),
+                "seq_tup_read": row["seq_tup_read"] - previous.get("seq_tup_read", 0),
+                "idx_scans": row["idx_scan"] - previous.get("idx_scan", 0),
+                "rows_written": sum(
+                    row[column] - previous.get(column, 0)
+                    for column in ("n_tup_ins", "n_tup_upd", "n_tup_del")
+                ),
+                "live_rows": live,
+                "dead_rows": dead,
+                "dead_ratio": round(dead / (live + dead), 3) if live + dead else 0.0,
+                "total_bytes": row["total_bytes"],
+                "last_autovacuum": row["last_autovacuum"],
+            }
+        )
+
+    return {
+        "statements": sorted(statements, key=lambda s: -s["total_ms"])[:STATEMENT_LIMIT],
+        "tables": tables,
+        "unused_indexes": [
+            f"{row['relname']}.{row['indexrelname']}"
+            for row in (after["indexes"] if isinstance(after["indexes"], list) else [])
+            if row["idx_scan"] == 0
+        ],
+    }
+
+
+def flag_regressions(current, previous):
+    # current/previous: diagnostics artifacts (build_diagnostics output) for the same run type
+    flags = []
+
+    for name, explained in current["plans"].items():
+        summary = explained.get("summary")
+        previous_summary = (
+            ((previous or {}).get("plans") or {}).get(name, {}).get("summary")
+        )
+        if not summary:
+            continue
+
+        new_seq_scans = sorted(
+            set(summary["seq_scans"])
+            - set((previous_summary or {}).get("seq_scans", summary["seq_scans"]))
+        )
+        if new_seq_scans:
+            flags.append(
+                {
+                    "type": "new_seq_scan",
+                    "query": name,
+                    "detail": f"Sequential scan on {', '.join(new_seq_scans)}",
+                }
+            )
+
+        # Latency needs ANALYZE timings on both runs
+        if summary.get("execution_ms") is not None and (previous_summary or {}).get(
+            "execution_ms"
+        ):
+            now_ms, was_ms = summary["execution_ms"], previous_summary["execution_ms"]
+            if now_ms >= was_ms * LATENCY_RATIO and now_ms - was_ms >= LATENCY_MIN_INCREASE_MS:
+                flags.append(
+                    {
+                        "type": "latency_jump",
+                        "query": name,
+                        "detail": f"{was_ms:.1f} ms -> {now_ms:.1f} ms",
+                    }
+                )
+
+    previous_statements = _by_key(
+        ((previous or {}).get("activity") or {}).get("statements", []), "queryid"
+    )
+    for statement in current["activity"]["statements"]:
+        was = previous_statements.get(statement["queryid"])
+        if (
+            was
+            and statement["mean_ms"] >= was["mean_ms"] * LATENCY_RATIO
+            and statement["mean_ms"] - was["mean_ms"] >= LATENCY_MIN_INCREASE_MS
+        ):
+            flags.append(
+                {
+                    "type": "latency_jump",
+                    "query": statement["query"][:120],
+                    "detail": f"{was['mean_ms']:.1f} ms -> {statement['mean_ms']:.1f} ms per call",
+                }
+            )
+
+    for table in current["activity"]["tables"]:
+        if table["dead_ratio"] >= DEAD_TUPLE_RATIO and table["dead_rows"] >= SEQ_SCAN_MIN_ROWS:
+            flags.append(
+                {
+                    "type": "bloat",
+                    "query": table["relname"],
+                    "detail": f"{table['dead_ratio']:.0%} dead tuples ({table['dead_rows']} rows)",
+                }
+            )
+
+    return flags
+
+
+def _top_statements(snapshot_data):
+    # Snapshot as stored in the artifact: only the STATEMENT_LIMIT statements with the most time
+    if not isinstance(snapshot_data["statements"], list):
+        return snapshot_data
+    return dict(snapshot_data, statements=snapshot_data["statements"][:STATEMENT_LIMIT])
+
+
+def build_diagnostics(fetch, run_type, before, previous=None, analyze=False):
+    # Take the "after" snapshot, explain the known queries and compare with the previous artifact
+    # Plans are captured on every run; analyze=True adds timings by executing the queries
+    after = snapshot(fetch, "after")
+    diagnostics = {
+        "run_type": run_type,
+        "started_at": before["captured_at"],
+        "finished_at": after["captured_at"],
+        "activity": diff_snapshots(before, after),
+        "plans": explain_known_queries(fetch, analyze=analyze),
+        "snapshots": {"before": _top_statements(before), "after": _top_statements(after)},
+    }
+    diagnostics["regressions"] = flag_regressions(diagnostics, previous)
+
+    for flag in diagnostics["regressions"]:
+        print(f"DB REGRESSION [{flag['type']}] {flag['query']}: {flag['detail']}")
+    return diagnostics
+
+
+def _latest_key(prefix, run_type):
+    return f"{prefix.rstrip('/')}/diagnostics/latest_{run_type}.json"
+
+
+def load_previous(s3_client, bucket, prefix, run_type):
+    # The previous artifact for this run type, or None on the first run
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=_latest_key(prefix, run_type))
+        return json.loads(response["Body"].read())
+    except Exception as e:
+        print(f"No previous diagnostics for {run_type}: {str(e)}")
+        return None
+
+
+def save_diagnostics(s3_client, bucket, prefix, diagnostics):
+    # Dated artifact next to the reports (reports/YYYY/MM/DD/) plus the "latest" copy compared
+    # against by the next run of the same type
+    now = datetime.utcnow()
+    body = json.dumps(diagnostics, indent=2, default=str)
+    key = (
+        f"{prefix.rstrip('/')}/{now:%Y/%m/%d}/"
+        f"db_diagnostics_{diagnostics['run_type']}_{now:%Y-%m-%d_%H%M%S}.json"
+    )
+    for target in (key, _latest_key(prefix, diagnostics["run_type"])):
+        s3_client.put_object(
+            Bucket=bucket, Key=target, Body=body, ContentType="application/json"
+        )
+    print(
+        f"Saved DB diagnostics to s3://{bucket}/{key} "
+        f"({len(diagnostics['regressions'])} regressions flagged)"
+    )
+    return key
@@ -0,0 +1,111 @@
+# Order notification queue for webhook micro-batch ingestion
+# - SqsOrderQueue: production queue (SQS), fed by receiveSquarespaceWebhook
+# - LocalOrderQueue: in-memory stand-in with the same interface for tests and local runs
+# - MicroBatcher: drains a queue into batches bounded by size or time
+
+import itertools
+import json
+import time
+from collections import deque
+
+
+class SqsOrderQueue:
+    # receive() long-polls: an empty result only means nothing arrived during wait_seconds
+    supports_long_poll = True
+
+    def __init__(self, queue_url, sqs_client=None):
+        import boto3
+
+        self.queue_url = queue_url
+        self._sqs = sqs_client or boto3.client("sqs")
+
+    def send(self, message):
+        self._sqs.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(message))
+
+    def receive(self, max_messages=10, wait_seconds=1):
+        # Returns [(receipt_handle, message)]; SQS caps a single receive at 10 messages
+        response = self._sqs.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=min(max_messages, 10),
+            WaitTimeSeconds=int(wait_seconds),
+        )
+        return [
+            (record["ReceiptHandle"], json.loads(record["Body"]))
+            for record in response.get("Messages", [])
+        ]
+
+    def delete(self, receipt_handles):
+        # delete_message_batch accepts at most 10 entries per call
+        handles = list(receipt_handles)
+        for start in range(0, len(handles), 10):
+            entries = [
+                {"Id": str(index), "ReceiptHandle": handle}
+                for index, handle in enumerate(handles[start : start + 10])
+            ]
+            self._sqs.delete_message_batch(QueueUrl=self.queue_url, Entries=entries)
+
+
+class LocalOrderQueue:
+    # receive() returns immediately: an empty result means the queue is drained
+    supports_long_poll = False
+
+    def __init__(self):
+        self._messages = deque()
+        self._in_flight = {}
+        self._receipts = itertools.count(1)
+
+    def send(self, message):
+        # Round-trip through JSON so messages behave like SQS bodies
+        self._messages.append(json.loads(json.dumps(message)))
+
+    def receive(self, max_messages=10, wait_seconds=0):
+        received = []
+        while self._messages and len(received) < max_messages:
+            receipt = str(next(self._receipts))
+            message = self._messages.popleft()
+            self._in_flight[receipt] = message
+            received.append((receipt, message))
+        return received
+
+    def delete(self, receipt_handles):
+        for receipt in receipt_handles:
+            self._in_flight.pop(receipt, None)
+
+    def release(self, receipt_handles):
+        # Return undeleted messages to the queue (SQS does this when the visibility timeout expires)
+        for receipt in receipt_handles:
+            message = self._in_flight.pop(receipt, None)
+            if message is not None:
+                self._messages.append(message)
+
+    def __len__(self):
+        return len(self._messages)
+
+
+class MicroBatcher:
+    def __init__(self, order_queue, max_batch_size=50, max_wait_seconds=60, clock=None):
+        self.order_queue = order_queue
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._clock = clock or time.monotonic
+
+    def next_batch(self):
+        # Collect messages until the batch is full or max_wait_seconds has passed
+        # Returns [(receipt_handle, message)], empty if nothing arrived in the window
+        batch = []
+        deadline = self._clock() + self.max_wait_seconds
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - self._clock()
+            if remaining <= 0:
+                break
+            received = self.order_queue.receive(
+                max_messages=self.max_batch_size - len(batch),
+                wait_seconds=min(remaining, 20),
+            )
+            if not received and not self.order_queue.supports_long_poll:
+                # Without long polling, retrying would spin until the deadline
+                break
+            batch.extend(received)
+
+        return batch
@@ -0,0 +1,85 @@
+# Spark schema for Squarespace order files (Glue only: requires pyspark)
+# Archived files are read with this declared schema instead of inferring it over many small files
+# - RAW_ORDERS_FILE: one API response file, {"result": [order, ...]}
+
+from pyspark.sql.types import (
+    ArrayType,
+    BooleanType,
+    DoubleType,
+    IntegerType,
+    StringType,
+    StructField,
+    StructType,
+)
+
+MONEY = StructType(
+    [StructField("currency", StringType()), StructField("value", StringType())]
+)
+
+ADDRESS = StructType(
+    [
+        StructField("firstName", StringType()),
+        StructField("lastName", StringType()),
+        StructField("address1", StringType()),
+        StructField("address2", StringType()),
+        StructField("city", StringType()),
+        StructField("state", StringType()),
+        StructField("countryCode", StringType()),
+        StructField("postalCode", StringType()),
+        StructField("phone", StringType()),
+    ]
+)
+
+LINE_ITEM = StructType(
+    [
+        StructField("id", StringType()),
+        StructField("variantId", StringType()),
+        StructField("sku", StringType()),
+        StructField("weight", DoubleType()),
+        StructField("width", DoubleType()),
+        StructField("length", DoubleType()),
+        StructField("height", DoubleType()),
+        StructField("productId", StringType()),
+        StructField("productName", StringType()),
+        StructField("quantity", IntegerType()),
+        StructField("unitPricePaid", MONEY),
+        StructField(
+            "variantOptions",
+            ArrayType(
+                StructType(
+                    [
+                        StructField("optionName", StringType()),
+                        StructField("value", StringType()),
+                    ]
+                )
+            ),
+        ),
+        StructField("lineItemType", StringType()),
+    ]
+)
+
+ORDER = StructType(
+    [
+        StructField("id", StringType()),
+        StructField("orderNumber", StringType()),
+        StructField("createdOn", StringType()),
+        StructField("modifiedOn", StringType()),
+        StructField("fulfilledOn", StringType()),
+        StructField("channel", StringType()),
+        StructField("testmode", BooleanType()),
+        StructField("customerEmail", StringType()),
+        StructField("billingAddress", ADDRESS),
+        StructField("shippingAddress", ADDRESS),
+        StructField("fulfillmentStatus", StringType()),
+        StructField("lineItems", ArrayType(LINE_ITEM)),
+        StructField("subtotal", MONEY),
+        StructField("shippingTotal", MONEY),
+        StructField("discountTotal", MONEY),
+        StructField("taxTotal", MONEY),
+        StructField("refundedTotal", MONEY),
+        StructField("grandTotal", MONEY),
+        StructField("channelName", StringType()),
+    ]
+)
+
+RAW_ORDERS_FILE = StructType([StructField("result", ArrayType(ORDER))])
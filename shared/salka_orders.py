@@ -0,0 +1,134 @@
+# Shared Squarespace order flattening for the Python (non-Spark) ingestion paths
+# Mirrors the Glue "Explode & Flatten JSON Data" SQL node so every path stages identical rows
+
+# Default staging tables (database/schema/create-tables.sql), overridable per loader
+STAGING_ORDERS_TABLE = "temp_orders_staging"
+STAGING_ORDER_ITEMS_TABLE = "temp_order_items_staging"
+
+ORDER_COLUMNS = [
+    "order_id",
+    "order_number",
+    "created_on",
+    "modified_on",
+    "fulfilled_on",
+    "customer_email",
+    "customer_name",
+    "shipping_city",
+    "shipping_state",
+    "shipping_country",
+    "fulfillment_status",
+    "discount_total",
+    "refund_total",
+    "order_total",
+]
+
+ORDER_ITEM_COLUMNS = [
+    "order_id",
+    "product_id",
+    "product_sku",
+    "product_name",
+    "product_quantity",
+    "product_price",
+    "product_color",
+]
+
+
+def _money(amount):
+    # Squarespace money fields are {"currency": "USD", "value": "90.00"}; missing means 0
+    if not amount or amount.get("value") is None:
+        return "0"
+    return amount["value"]
+
+
+def staging_lock_sql(staging_orders_table, transaction=True):
+    # Advisory lock held while a loader stages and applies a batch. Keyed by the staging table, so
+    # every loader writing the same tables (Glue job, micro-batch Lambda) excludes the others, while
+    # replay chunks with their own tables run alongside
+    lock_function = "pg_advisory_xact_lock" if transaction else "pg_advisory_lock"
+    return f"SELECT {lock_function}(hashtext('{staging_orders_table}'))"
+
+
+def staging_unlock_sql(staging_orders_table):
+    return f"SELECT pg_advisory_unlock(hashtext('{staging_orders_table}'))"
+
+
+def copy_csv(rows, columns):
+    # COPY ... (FORMAT csv) body for staging rows. Postgres reads an unquoted empty field as NULL
+    # and a quoted one as an empty string, so every non-NULL value is quoted and None is left bare
+    # (csv.writer writes both as a bare empty field, turning "" into NULL)
+    lines = []
+    for row in rows:
+        fields = []
+        for column in columns:
+            value = row[column]
+            if value is None:
+                fields.append("")
+            else:
+                fields.append('"' + str(value).replace('"', '""') + '"')
+        lines.append(",".join(fields) + "\n")
+    return "".join(lines)
+
+
+def _concat(*parts):
+    # Spark SQL CONCAT: NULL if any part is NULL
+    if any(part is None for part in parts):
+        return None
+    return "".join(parts)
+
+
+def _coalesce(*values):
+    # SQL COALESCE: first non-NULL value (empty strings are kept)
+    return next((value for value in values if value is not None), None)
+
+
+def flatten_order(order):
+    # Return (order_row, item_rows) for one Squarespace order, keyed by the staging columns
+    shipping = order.get("shippingAddress") or {}
+
+    order_row = {
+        "order_id": order["id"],
+        "order_number": order["orderNumber"],
+        "created_on": order["createdOn"],
+        "modified_on": order["modifiedOn"],
+        "fulfilled_on": order.get("fulfilledOn"),
+        "customer_email": order.get("customerEmail"),
+        "customer_name": _concat(shipping.get("firstName"), " ", shipping.get("lastName")),
+        "shipping_city": shipping.get("city"),
+        "shipping_state": shipping.get("state"),
+        "shipping_country": shipping.get("countryCode"),
+        "fulfillment_status": order["fulfillmentStatus"],
+        "discount_total": _money(order.get("discountTotal")),
+        "refund_total": _money(order.get("refundedTotal")),
+        "order_total": _money(order.get("grandTotal")),
+    }
+
+    item_rows = []
+    for line_item in order.get("lineItems") or []:
+        variant_options = line_item.get("variantOptions") or []
+        item_rows.append(
+            {
+                "order_id": order["id"],
+                "product_id": line_item.get("productId"),
+                "product_sku": line_item.get("sku"),
+                "product_name": line_item.get("productName"),
+                "product_quantity": line_item.get("quantity"),
+                "product_price": _money(line_item.get("unitPricePaid")),
+                # Color from the first variant option, like the Glue flatten's COALESCE
+                "product_color": _coalesce(
+                    variant_options[0].get("value") if variant_options else None,
+                    "Default",
+                ),
+            }
+        )
+
+    return order_row, item_rows
+
+
+def latest_orders(orders):
+    # Keep the most recently modified version of each order (ISO-8601 strings sort by time)
+    latest = {}
+    for order in orders:
+        current = latest.get(order["id"])
+        if current is None or order["modifiedOn"] >= current["modifiedOn"]:
+            latest[order["id"]] = order
+    return list(latest.values())
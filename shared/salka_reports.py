@@ -0,0 +1,203 @@
+# Report queries shared by the scheduled reports and the on-demand report API
+# - REPORTS: the pending orders, order schedule and cut list queries with optional filters
+# - SALES_ROLLUP_QUERY, STATUS_CHANGES_QUERY: the scheduled report's other sheets
+# - build_report_query(): query text and bind parameters for a report and its filters
+# - ReportCache: size-bounded LRU cache of rendered reports, cleared when the ETL data version changes
+
+from collections import OrderedDict
+from datetime import date, timedelta
+
+# {where} is replaced with the filter conditions; default_status applies when no status is given
+REPORTS = {
+    "pending_orders": {
+        "title": "Pending Orders",
+        "default_status": "pending",
+        "sql": """
+            SELECT product_sku, product_name, product_color, sum(product_quantity) AS quantity
+            FROM orders o
+            JOIN order_items oi
+            ON o.order_id = oi.order_id
+            {where}
+            GROUP BY product_sku, product_name, product_color, product_price
+            ORDER BY product_price DESC
+            """,
+    },
+    "order_schedule": {
+        "title": "Order Schedule",
+        "default_status": None,
+        "sql": """
+            SELECT DATE(created_on) as ordered_on, product_sku, product_name,
+                product_color, sum(product_quantity) as quantity
+            FROM orders o
+            JOIN order_items oi
+            ON o.order_id = oi.order_id
+            {where}
+            GROUP BY ordered_on, product_sku, product_name, product_color, product_price
+            ORDER BY ordered_on, product_price DESC
+            """,
+    },
+    "cut_list": {
+        "title": "Materials Cut List",
+        "default_status": "pending",
+        "sql": """
+            SELECT
+                bom.material_piece, bom.material_color,
+                SUM(bom.material_quantity * oi.product_quantity) AS total_material_needed,
+                p.product_name, p.product_color, SUM(oi.product_quantity) AS total_products_ordered
+            FROM
+                orders o
+            JOIN
+                order_items oi ON o.order_id = oi.order_id
+            JOIN
+                products p ON oi.product_sku = p.product_sku
+            JOIN
+                bill_of_materials bom ON p.product_sku = bom.product_sku
+            {where}
+            GROUP BY
+                bom.material_piece, bom.material_color,
+                p.product_name, p.product_color, p.product_sku
+            ORDER BY
+                bom.material_piece, bom.material_color
+            """,
+    },
+}
+
+# Monthly sales by region and product for the last 12 months (precomputed sales_rollup)
+SALES_ROLLUP_QUERY = """
+    SELECT
+        r.period_start AS month, r.shipping_country, r.shipping_state,
+        r.product_sku, p.product_name, p.product_color,
+        r.units, r.order_count, r.revenue, r.discount_total, r.refund_total,
+        r.revenue - r.discount_total - r.refund_total AS net_revenue
+    FROM
+        sales_rollup r
+    LEFT JOIN
+        products p ON r.product_sku = p.product_sku
+    WHERE
+        r.period_grain = 'month'
+        AND r.period_start >= date_trunc('month', now() - INTERVAL '11 months')::DATE
+    ORDER BY
+        month DESC, r.shipping_country, r.shipping_state, net_revenue DESC
+    """
+
+# Status changes logged since the previous report run, by loader transaction id up to :covered_xid
+# (the report's snapshot xmin), so loads in flight during a report are picked up by the next one
+STATUS_CHANGES_QUERY = """
+    SELECT
+        l.change_type, l.logged_at, o.order_number, o.customer_name,
+        l.previous_status, l.new_status, l.new_fulfilled_on AS fulfilled_on,
+        l.new_refund_total - COALESCE(l.previous_refund_total, 0) AS refund_amount,
+        oi.product_sku, oi.product_name, oi.product_color, oi.product_quantity
+    FROM
+        order_status_log l
+    JOIN
+        orders o ON l.order_id = o.order_id
+    LEFT JOIN
+        order_items oi ON o.order_id = oi.order_id
+    WHERE
+        l.logged_xid >= (SELECT COALESCE(MAX(covered_xid), 0) FROM report_runs)
+        AND l.logged_xid < :covered_xid
+    ORDER BY
+        l.change_type, l.logged_at, o.order_number
+    """
+
+# Current ETL data version, bumped by the loaders (Glue job, micro-batch Lambda, migrate_skus.py)
+DATA_VERSION_QUERY = "SELECT data_version FROM etl_data_version"
+
+# Run once per load that changed data, as the last statement before COMMIT: the single row stays
+# locked until the commit, so holding it any longer would serialize concurrent loaders
+BUMP_DATA_VERSION_SQL = (
+    "UPDATE etl_data_version SET data_version = data_version + 1, committed_at = now()"
+)
+
+
+def _parse_date(value, name):
+    if value is None or value == "" or isinstance(value, date):
+        return value or None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be YYYY-MM-DD, got {value!r}")
+
+
+def build_report_query(report_name, start_date=None, end_date=None, status=None):
+    # Returns (sql, params); dates filter created_on (end_date inclusive), status "all" disables
+    # the report's default status filter. Raises ValueError for unknown reports or bad dates.
+    if report_name not in REPORTS:
+        raise ValueError(f"Unknown report: {report_name} (expected one of {list(REPORTS)})")
+    report = REPORTS[report_name]
+
+    start_date = _parse_date(start_date, "start_date")
+    end_date = _parse_date(end_date, "end_date")
+    if status is None:
+        status = report["default_status"]
+
+    conditions = []
+    params = {}
+    if status and status.lower() != "all":
+        conditions.append("lower(o.fulfillment_status) = :status")
+        params["status"] = status.lower()
+    if start_date:
+        conditions.append("o.created_on >= :start_date")
+        params["start_date"] = start_date
+    if end_date:
+        conditions.append("o.created_on < :end_before")
+        params["end_before"] = end_date + timedelta(days=1)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return report["sql"].format(where=where), params
+
+
+class ReportCache:
+    # Rendered report bodies keyed by (report, filters, format), evicted least recently used first
+    # once max_bytes is exceeded. Every entry belongs to one data version: seeing a new version
+    # clears the cache, so results never outlive the ETL commit that changed them.
+
+    def __init__(self, max_bytes=50 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.data_version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def _check_version(self, data_version):
+        if data_version != self.data_version:
+            self.clear()
+            self.data_version = data_version
+
+    def get(self, key, data_version):
+        self._check_version(data_version)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, body, content_type, data_version):
+        # body: bytes; entries larger than the whole cache are not stored
+        self._check_version(data_version)
+        if len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key)[0])
+        while self._entries and self._bytes + len(body) > self.max_bytes:
+            _, (evicted_body, _) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted_body)
+        self._entries[key] = (body, content_type)
+        self._bytes += len(body)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "data_version": self.data_version,
+        }
@@ -0,0 +1,139 @@
+# Shared Secrets Manager access for the Glue job and Lambda functions
+# - In-process TTL cache so warm invocations skip the Secrets Manager round-trip
+# - Rotation-aware: call_with_secret_refresh() refetches the secret once on an auth failure
+# - One configuration surface: env variables below, or configure() from Glue job arguments
+
+import json
+import os
+import threading
+import time
+
+import boto3
+
+# Configuration (env variables, overridable with configure())
+_config = {
+    "region": os.environ.get("SALKA_AWS_REGION")
+    or os.environ.get("AWS_REGION")
+    or "us-east-1",
+    "ttl_seconds": int(os.environ.get("SECRET_TTL_SECONDS", "900")),
+    # Forced refreshes (auth failures) reuse a secret fetched this recently instead of refetching,
+    # so repeated failures - e.g. forged webhook signatures - can't drive Secrets Manager calls
+    "min_refresh_seconds": int(os.environ.get("SECRET_MIN_REFRESH_SECONDS", "60")),
+    "rds_secret_name": os.environ.get("RDS_SECRET_NAME", "salka-rds-credentials"),
+    "squarespace_secret_name": os.environ.get("SQUARESPACE_SECRET_NAME"),
+}
+
+# Error text that means credentials are stale (Postgres invalid password / SQLSTATE 28P01)
+AUTH_FAILURE_MARKERS = ("password authentication failed", "28P01")
+
+# secret_name -> {"value", "version_id", "fetched_at"}
+_cache = {}
+_clients = {}
+_lock = threading.Lock()
+
+
+def configure(
+    region=None, ttl_seconds=None, rds_secret_name=None, squarespace_secret_name=None
+):
+    # Override env configuration (e.g. from Glue job arguments); clears the cache on region change
+    with _lock:
+        if region and region != _config["region"]:
+            _config["region"] = region
+            _cache.clear()
+        if ttl_seconds is not None:
+            _config["ttl_seconds"] = int(ttl_seconds)
+        if rds_secret_name:
+            _config["rds_secret_name"] = rds_secret_name
+        if squarespace_secret_name:
+            _config["squarespace_secret_name"] = squarespace_secret_name
+
+
+def _get_client():
+    # One Secrets Manager client per region, reused for the life of the process
+    region = _config["region"]
+    if region not in _clients:
+        _clients[region] = boto3.client("secretsmanager", region_name=region)
+    return _clients[region]
+
+
+def get_secret(secret_name, force_refresh=False):
+    # Return the parsed JSON secret, fetching from Secrets Manager when missing or expired
+    # force_refresh refetches at most once per min_refresh_seconds per secret
+    with _lock:
+        cached = _cache.get(secret_name)
+        cache_age = time.monotonic() - cached["fetched_at"] if cached else None
+        max_age = _config["min_refresh_seconds"] if force_refresh else _config["ttl_seconds"]
+        if cached and cache_age < max_age:
+            return cached["value"]
+
+        try:
+            response = _get_client().get_secret_value(SecretId=secret_name)
+        except Exception as e:
+            raise Exception(f"Failed to retrieve secret {secret_name}: {str(e)}")
+
+        value = json.loads(response["SecretString"])
+        if cached and cached.get("version_id") != response.get("VersionId"):
+            print(f"Secret {secret_name} rotated, using version {response.get('VersionId')}")
+
+        _cache[secret_name] = {
+            "value": value,
+            "version_id": response.get("VersionId"),
+            "fetched_at": time.monotonic(),
+        }
+        return value
+
+
+def invalidate(secret_name=None):
+    # Drop one cached secret (or all of them) so the next get_secret() refetches
+    with _lock:
+        if secret_name is None:
+            _cache.clear()
+        else:
+            _cache.pop(secret_name, None)
+
+
+def is_auth_failure(error):
+    # PermissionError is raised by callers for HTTP 401/403; DB errors are matched on message text
+    if isinstance(error, PermissionError):
+        return True
+    message = str(error)
+    return any(marker in message for marker in AUTH_FAILURE_MARKERS)
+
+
+def call_with_secret_refresh(secret_name, fn, auth_failure=is_auth_failure):
+    # Call fn(secret); on an auth failure refetch the secret once (it may have rotated) and retry
+    # Within min_refresh_seconds of the last fetch the secret is already current: fail without retry
+    secret = get_secret(secret_name)
+    try:
+        return fn(secret)
+    except Exception as e:
+        if not auth_failure(e):
+            raise
+        refreshed = get_secret(secret_name, force_refresh=True)
+        if refreshed is secret:
+            raise
+        print(f"Auth failure using {secret_name}, refreshed secret and retrying once")
+        return fn(refreshed)
+
+
+def get_rds_credentials(force_refresh=False):
+    # RDS credentials: username, password, host, port, dbName
+    return get_secret(_config["rds_secret_name"], force_refresh=force_refresh)
+
+
+def get_rds_secret_name():
+    return _config["rds_secret_name"]
+
+
+def get_squarespace_secret_name():
+    if not _config["squarespace_secret_name"]:
+        raise ValueError("Missing required env variable: SQUARESPACE_SECRET_NAME")
+    return _config["squarespace_secret_name"]
+
+
+def get_squarespace_api_key(force_refresh=False):
+    secret = get_secret(get_squarespace_secret_name(), force_refresh=force_refresh)
+    squarespace_api_key = secret.get("SQUARESPACE_API_KEY")
+    if not squarespace_api_key:
+        raise Exception("No API KEY returned from Secrets Manager")
+    return squarespace_api_key
@@ -0,0 +1,5 @@
+# Shared modules are deployed flat (Lambda layer / Glue --extra-py-files), so import them the same way
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared"))
@@ -0,0 +1,142 @@
+import salka_db_diagnostics
+from salka_db_diagnostics import build_diagnostics, diff_snapshots
+
+SEQ_SCAN_ROWS = salka_db_diagnostics.SEQ_SCAN_MIN_ROWS
+
+
+def statement(queryid, calls, total_exec_time):
+    return {
+        "queryid": queryid,
+        "query": f"SELECT {queryid}",
+        "calls": calls,
+        "total_exec_time": total_exec_time,
+        "mean_exec_time": total_exec_time / calls,
+        "rows": calls,
+        "shared_blks_hit": 0,
+        "shared_blks_read": 10 * calls,
+    }
+
+
+def make_snapshot(statements, label="before"):
+    return {
+        "label": label,
+        "captured_at": "2024-03-01T00:00:00",
+        "statements": statements,
+        "tables": [],
+        "indexes": [],
+    }
+
+
+def test_diff_uses_before_counters_of_each_statement():
+    before = make_snapshot([statement("1", 100, 1000.0), statement("2", 5, 50.0)])
+    after = make_snapshot([statement("1", 110, 1100.0), statement("2", 5, 50.0)], "after")
+
+    activity = diff_snapshots(before, after)
+
+    assert activity["statements"] == [
+        {
+            "queryid": "1",
+            "query": "SELECT 1",
+            "calls": 10,
+            "total_ms": 100.0,
+            "mean_ms": 10.0,
+            "shared_blks_read": 100,
+        }
+    ]
+
+
+def test_statement_new_since_before_counts_from_zero():
+    before = make_snapshot([statement("1", 100, 1000.0)])
+    after = make_snapshot([statement("1", 100, 1000.0), statement("2", 3, 30.0)], "after")
+
+    activity = diff_snapshots(before, after)
+
+    assert [(s["queryid"], s["calls"], s["total_ms"]) for s in activity["statements"]] == [
+        ("2", 3, 30.0)
+    ]
+
+
+def test_no_statement_activity_without_before_snapshot():
+    before = make_snapshot({"unavailable": "pg_stat_statements missing"})
+    after = make_snapshot([statement("1", 100, 1000.0)], "after")
+
+    assert diff_snapshots(before, after)["statements"] == []
+
+
+def plan_row(seq_scan_rows, analyze=False):
+    scan = {"Node Type": "Seq Scan", "Relation Name": "orders", "Plan Rows": seq_scan_rows}
+    root = {"Plan": {"Node Type": "Aggregate", "Total Cost": 10.0, "Plans": [scan]}}
+    if analyze:
+        scan["Actual Rows"] = seq_scan_rows
+        root["Execution Time"] = 12.5
+    return [{"QUERY PLAN": [root]}]
+
+
+def explain_fetch(seq_scan_rows, explained):
+    def fetch(sql):
+        explained.append(sql)
+        return plan_row(seq_scan_rows, analyze="ANALYZE" in sql)
+
+    return fetch
+
+
+def test_artifact_keeps_top_statements_only(monkeypatch):
+    monkeypatch.setattr(salka_db_diagnostics, "STATEMENT_LIMIT", 2)
+    before_rows = [statement(str(i), 10, 100.0 - i) for i in range(5)]
+    after_rows = [statement(str(i), 20, 200.0 - i) for i in range(5)]
+    monkeypatch.setattr(
+        salka_db_diagnostics, "snapshot", lambda fetch, label: make_snapshot(after_rows, label)
+    )
+
+    diagnostics = build_diagnostics(explain_fetch(10, []), "etl", make_snapshot(before_rows))
+
+    assert [s["queryid"] for s in diagnostics["activity"]["statements"]] == ["0", "1"]
+    assert len(diagnostics["snapshots"]["before"]["statements"]) == 2
+    assert len(diagnostics["snapshots"]["after"]["statements"]) == 2
+
+
+def test_plans_are_captured_without_analyze_by_default(monkeypatch):
+    monkeypatch.setattr(
+        salka_db_diagnostics, "snapshot", lambda fetch, label: make_snapshot([], label)
+    )
+    explained = []
+
+    diagnostics = build_diagnostics(explain_fetch(10, explained), "etl", make_snapshot([]))
+
+    assert set(diagnostics["plans"]) == set(salka_db_diagnostics.known_queries())
+    assert all(sql.startswith("EXPLAIN (FORMAT JSON) ") for sql in explained)
+    summary = diagnostics["plans"]["sales_rollup"]["summary"]
+    assert summary["execution_ms"] is None
+    assert summary["total_cost"] == 10.0
+
+
+def test_new_seq_scan_flagged_from_plan_rows(monkeypatch):
+    monkeypatch.setattr(
+        salka_db_diagnostics, "snapshot", lambda fetch, label: make_snapshot([], label)
+    )
+    previous = build_diagnostics(explain_fetch(10, []), "etl", make_snapshot([]))
+
+    current = build_diagnostics(
+        explain_fetch(SEQ_SCAN_ROWS, []), "etl", make_snapshot([]), previous
+    )
+
+    flagged = {flag["query"] for flag in current["regressions"] if flag["type"] == "new_seq_scan"}
+    assert flagged == set(salka_db_diagnostics.known_queries())
+    # No latency comparison without ANALYZE timings
+    assert not [flag for flag in current["regressions"] if flag["type"] == "latency_jump"]
+
+
+def test_analyze_uses_actual_rows_and_timings(monkeypatch):
+    monkeypatch.setattr(
+        salka_db_diagnostics, "snapshot", lambda fetch, label: make_snapshot([], label)
+    )
+    explained = []
+
+    diagnostics = build_diagnostics(
+        explain_fetch(SEQ_SCAN_ROWS, explained), "etl", make_snapshot([]), analyze=True
+    )
+
+    assert all(sql.startswith("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ") for sql in explained)
+    summary = diagnostics["plans"]["cut_list"]["summary"]
+    assert summary["execution_ms"] == 12.5
+    assert summary["seq_scans"] == ["orders"]
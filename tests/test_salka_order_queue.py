@@ -0,0 +1,85 @@
+from salka_order_queue import LocalOrderQueue, MicroBatcher
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LongPollQueue(LocalOrderQueue):
+    # Behaves like SQS: an empty receive waits out wait_seconds on the fake clock
+    supports_long_poll = True
+
+    def __init__(self, clock, arrivals):
+        super().__init__()
+        self.clock = clock
+        self.arrivals = list(arrivals)  # [(arrives_at, message)]
+        self.waits = []
+
+    def receive(self, max_messages=10, wait_seconds=0):
+        while self.arrivals and self.arrivals[0][0] <= self.clock.now:
+            self.send(self.arrivals.pop(0)[1])
+        received = super().receive(max_messages, wait_seconds)
+        if not received:
+            self.waits.append(wait_seconds)
+            self.clock.now += wait_seconds
+        return received
+
+
+def test_batch_stops_at_max_batch_size():
+    order_queue = LocalOrderQueue()
+    for order_id in range(7):
+        order_queue.send({"order_id": str(order_id)})
+
+    batch = MicroBatcher(order_queue, max_batch_size=5).next_batch()
+
+    assert [message["order_id"] for _, message in batch] == ["0", "1", "2", "3", "4"]
+    assert len(order_queue) == 2
+
+
+def test_local_queue_returns_partial_batch_once_drained():
+    order_queue = LocalOrderQueue()
+    order_queue.send({"order_id": "1"})
+    clock = FakeClock()
+
+    batch = MicroBatcher(order_queue, max_batch_size=5, clock=clock).next_batch()
+
+    assert len(batch) == 1
+    assert clock.now == 0.0
+
+
+def test_long_poll_queue_waits_until_deadline():
+    clock = FakeClock()
+    order_queue = LongPollQueue(clock, [(0, {"order_id": "1"}), (30, {"order_id": "2"})])
+
+    batch = MicroBatcher(
+        order_queue, max_batch_size=5, max_wait_seconds=60, clock=clock
+    ).next_batch()
+
+    assert [message["order_id"] for _, message in batch] == ["1", "2"]
+    assert clock.now == 60
+    # Receives never wait longer than SQS's 20 second cap or past the deadline
+    assert all(wait <= 20 for wait in order_queue.waits)
+
+
+def test_empty_window_returns_empty_batch():
+    clock = FakeClock()
+    order_queue = LongPollQueue(clock, [])
+
+    assert MicroBatcher(order_queue, max_wait_seconds=45, clock=clock).next_batch() == []
+    assert order_queue.waits == [20, 20, 5]
+
+
+def test_release_returns_messages_to_queue():
+    order_queue = LocalOrderQueue()
+    order_queue.send({"order_id": "1"})
+    order_queue.send({"order_id": "2"})
+    (first_receipt, _), (second_receipt, _) = order_queue.receive()
+
+    order_queue.delete([first_receipt])
+    order_queue.release([second_receipt])
+
+    assert [message for _, message in order_queue.receive()] == [{"order_id": "2"}]
@@ -0,0 +1,135 @@
+from salka_orders import (
+    ORDER_COLUMNS,
+    ORDER_ITEM_COLUMNS,
+    copy_csv,
+    flatten_order,
+    latest_orders,
+)
+
+
+def make_order(**overrides):
+    order = {
+        "id": "order-1",
+        "orderNumber": "1001",
+        "createdOn": "2024-03-01T10:00:00.000Z",
+        "modifiedOn": "2024-03-01T10:00:00.000Z",
+        "fulfilledOn": None,
+        "customerEmail": "customer@example.com",
+        "fulfillmentStatus": "PENDING",
+        "shippingAddress": {
+            "firstName": "Ada",
+            "lastName": "Lovelace",
+            "city": "Boulder",
+            "state": "CO",
+            "countryCode": "US",
+        },
+        "discountTotal": {"currency": "USD", "value": "5.00"},
+        "refundedTotal": {"currency": "USD", "value": "0.00"},
+        "grandTotal": {"currency": "USD", "value": "85.00"},
+        "lineItems": [
+            {
+                "productId": "product-1",
+                "sku": "SQ-001",
+                "productName": "Frame Bag",
+                "quantity": 2,
+                "unitPricePaid": {"currency": "USD", "value": "45.00"},
+                "variantOptions": [{"optionName": "Color", "value": "Black"}],
+            }
+        ],
+    }
+    order.update(overrides)
+    return order
+
+
+def test_flatten_order_rows_match_staging_columns():
+    order_row, item_rows = flatten_order(make_order())
+
+    assert list(order_row) == ORDER_COLUMNS
+    assert [list(item_row) for item_row in item_rows] == [ORDER_ITEM_COLUMNS]
+    assert order_row["customer_name"] == "Ada Lovelace"
+    assert order_row["shipping_country"] == "US"
+    assert order_row["discount_total"] == "5.00"
+    assert item_rows[0]["product_sku"] == "SQ-001"
+    assert item_rows[0]["product_price"] == "45.00"
+    assert item_rows[0]["product_color"] == "Black"
+
+
+def test_flatten_order_customer_name_is_null_when_a_name_part_is_missing():
+    order = make_order(shippingAddress={"firstName": "Ada", "lastName": None})
+
+    order_row, _ = flatten_order(order)
+
+    assert order_row["customer_name"] is None
+
+
+def test_flatten_order_defaults_missing_money_and_color():
+    line_item = {"productId": "product-2", "sku": "SQ-002", "productName": "Strap", "quantity": 1}
+    order = make_order(refundedTotal=None, lineItems=[line_item])
+    del order["discountTotal"]
+
+    order_row, item_rows = flatten_order(order)
+
+    assert order_row["discount_total"] == "0"
+    assert order_row["refund_total"] == "0"
+    assert item_rows[0]["product_price"] == "0"
+    assert item_rows[0]["product_color"] == "Default"
+
+
+def test_flatten_order_keeps_empty_color():
+    line_item = dict(make_order()["lineItems"][0], variantOptions=[{"value": ""}])
+
+    _, item_rows = flatten_order(make_order(lineItems=[line_item]))
+
+    assert item_rows[0]["product_color"] == ""
+
+
+def test_latest_orders_keeps_most_recent_version():
+    first = make_order(modifiedOn="2024-03-01T10:00:00.000Z", fulfillmentStatus="PENDING")
+    second = make_order(modifiedOn="2024-03-02T09:00:00.000Z", fulfillmentStatus="FULFILLED")
+    other = make_order(id="order-2", orderNumber="1002")
+
+    latest = latest_orders([second, other, first])
+
+    assert len(latest) == 2
+    by_id = {order["id"]: order for order in latest}
+    assert by_id["order-1"]["fulfillmentStatus"] == "FULFILLED"
+    assert by_id["order-2"] is other
+
+
+def parse_copy_csv(text):
+    # Postgres COPY (FORMAT csv) rules: a bare empty field is NULL, a quoted one is the string
+    import csv
+
+    rows = []
+    for line in text.splitlines():
+        fields = []
+        for raw, value in zip(line.split(","), next(csv.reader([line]))):
+            fields.append(None if raw == "" else value)
+        rows.append(fields)
+    return rows
+
+
+def test_copy_csv_keeps_null_and_empty_string_distinct():
+    line_item = dict(make_order()["lineItems"][0], variantOptions=[{"value": ""}])
+    order = make_order(
+        shippingAddress={"firstName": None, "lastName": "Lovelace"}, lineItems=[line_item]
+    )
+    order_row, item_rows = flatten_order(order)
+
+    (staged_order,) = parse_copy_csv(copy_csv([order_row], ORDER_COLUMNS))
+    (staged_item,) = parse_copy_csv(copy_csv(item_rows, ORDER_ITEM_COLUMNS))
+    staged_order = dict(zip(ORDER_COLUMNS, staged_order))
+    staged_item = dict(zip(ORDER_ITEM_COLUMNS, staged_item))
+
+    assert staged_order["customer_name"] is None
+    assert staged_order["fulfilled_on"] is None
+    assert staged_item["product_color"] == ""
+    assert staged_item["product_quantity"] == "2"
+
+
+def test_copy_csv_quotes_embedded_delimiters():
+    line_item = dict(make_order()["lineItems"][0], productName='Frame Bag, "Large"')
+
+    _, item_rows = flatten_order(make_order(lineItems=[line_item]))
+
+    assert '"Frame Bag, ""Large"""' in copy_csv(item_rows, ORDER_ITEM_COLUMNS)